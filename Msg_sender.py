@@ -8,199 +8,54 @@ from tkinter.filedialog import askopenfilename # 文件选择对话框
 from tkinter.simpledialog import askstring # 字符串输入对话框
 
 from typing import Dict # 类型注解支持
-from markdown import markdown # markdown文本转HTML支持
-from tkhtmlview import HTMLScrolledText # HTML渲染支持
 import html # HTML编码解码支持
-import xlrd # Excel文件读取支持
-import requests, json # HTTP请求和JSON数据处理支持
 import datetime # 日期时间处理支持
-import time # 时间操作支持
 import os # 操作系统接口支持
-import tempfile # 临时文件操作支持
-import configparser # 配置文件读写支持
-import random # 随机数生成支持
 import logging
 import sys
-
-# 配置日志处理
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(sys.stdout)
-    ]
-)
-
-# 重定向标准错误输出到/dev/null以过滤系统级别的提示信息
-if sys.platform == 'darwin':
-    sys.stderr = open(os.devnull, 'w')
+import queue # 线程安全队列支持
+import threading # 线程支持
+from batch_sender import BatchSender, EVENT_PROGRESS # 群发调度引擎
+from rate_limiter import RateLimiter # 发送限速
+from retry import RetryPolicy # 发送重试策略
+from dead_letter import DeadLetterWriter, iter_dead_letters # 死信文件
+from send_journal import SendJournal, JOURNAL_SUFFIX, has_delivered_records # 群发日志
+from dedup_index import DedupIndex, DEDUP_FILE # 重复消息抑制
+from config_manager import get_config_manager, CONFIG_FILE # 配置管理
+from wechat_client import WeChat, get_http_session, http_pool_size # 企业微信消息发送
+from message_builder import MessageTemplate, default_template_text # 消息模板
+from media_cache import MediaUploader # 临时素材缓存
+from multi_account import build_accounts # 多应用分摊群发
+from recipient_directory import RecipientDirectory, check_recipients, normalize_identifier, DIRECTORY_FILE, ID_USERID # 接收用户通讯录解析
+from pipeline import staged, JobRenderer # 群发流水线
+from sheet_reader import open_sheet, supported_extensions # 表格读取层
+from sheet_cache import ensure_sidecar, CACHED_EXTENSIONS # 表格解析结果缓存
+from preview_pager import PreviewPager # 预览分页
+from metrics import metrics # 发送链路指标
 
 # 全局配置常量
-CONFIG_FILE = 'config.ini' # 配置文件路径
 Process_info='' # 进度信息
 README_FILE='about.md' # 关于信息文件路径
-TOKEN_FILE='token_access.conf' # 访问令牌文件路径
-COPYRIGHT_INFO='\nSending by API消息发送助手\nCopyright © 2023-2025 Kwangwah Hung\nThis software is open source and free to use under the MIT License.\nPermission is hereby granted, free of charge, to any person obtaining a copy of this software.' # 版权信息
-
-# 全局配置对象
-CONF_OBJ = configparser.ConfigParser()
-CONF_OBJ_default_section = 'default'
-
-# 配置管理类
-class ConfigManager:
-    def __init__(self, config_file):
-        self.config_file = config_file
-        self.config = configparser.ConfigParser()
-        self.default_section = "default"
-        self.required_fields = ["agentid", "cropid", "screctid"]
-        self.load_config()
-
-    def load_config(self):
-        """加载配置文件，如果不存在则创建默认配置"""
-        try:
-            if not os.path.exists(self.config_file):
-                self._create_default_config()
-            self.config.read(self.config_file, encoding='utf-8')
-        except Exception as e:
-            showerror("错误", f"加载配置文件失败：{str(e)}")
-
-    def _create_default_config(self):
-        """创建默认配置文件"""
-        default_section = f'自动配置项{random.randint(1000, 9999)}'
-        self.config[default_section] = {
-            'agentid': '',
-            'cropid': '',
-            'screctid': '',
-            self.default_section: 'true'
-        }
-        self.save_config()
-
-    def save_config(self):
-        """保存配置到文件"""
-        try:
-            with open(self.config_file, 'w', encoding='utf-8') as f:
-                self.config.write(f)
-        except Exception as e:
-            showerror("错误", f"保存配置文件失败：{str(e)}")
-
-    def get_default_section(self):
-        """获取默认配置节"""
-        for section in self.config.sections():
-            if self.config.getboolean(section, self.default_section, fallback=False):
-                return section
-        return None
-
-    def validate_config(self, section):
-        """验证配置项是否完整"""
-        if not self.config.has_section(section):
-            return False
-        return all(self.config.has_option(section, field) for field in self.required_fields)
-
-# 初始化配置管理器
-config_manager = ConfigManager(CONFIG_FILE)
-
-# 定义企业微信消息发送类
-# 配置应用相关初始信息
-class WeChat:
-    """企业微信消息发送类"""
-    def __init__(self, config_section=None):
-        """初始化企业微信配置
-        Args:
-            config_section: 配置节名称，如果为None则使用默认配置
-        """
-        if config_section is None:
-            config_section = config_manager.get_default_section()
-            if not config_section:
-                raise ValueError("未找到默认配置节")
-        
-        if not config_manager.validate_config(config_section):
-            raise ValueError(f"配置节 {config_section} 不完整或无效")
-        
-        config = config_manager.config[config_section]
-        self.CORPID = config.get('cropid')  # 企业ID
-        self.CORPSECRET = config.get('screctid')  # 应用Secret
-        self.AGENTID = config.get('agentid')  # 应用Agentid
-        self.ACCESS_TOKEN_PATH = TOKEN_FILE  # 存放access_token的路径
-        # self.AGENTID = "1000025"  # 应用Agentid
-        # self.ACCESS_TOKEN_PATH = "access_token.conf" # 存放access_token的路径
-# 根据初始配置信息获得登录信息access_token
-    def _get_access_token(self):       
-        url = f'https://qyapi.weixin.qq.com/cgi-bin/gettoken?corpid={self.CORPID}&corpsecret={self.CORPSECRET}'
-        res = requests.get(url=url)
-        # print(url)
-        # print()
-        return json.loads(res.text)['access_token']
-#将获取到的access_token保存到本地
-    def _save_access_token(self, cur_time):
-        with open(TOKEN_FILE, "w")as f:
-            access_token = self._get_access_token()
-            # 保存获取时间以及access_token
-            f.write("\t".join([str(cur_time), access_token]))
-        return access_token
-
-        """
-        读取"access_token.conf"中的access_token
-        """
-    def get_access_token(self):
-        cur_time = time.time()
-        try:
-            with open(TOKEN_FILE, "r")as f:
-                t, access_token = f.read().split()
-                # 判断access_token是否有效
-                if 0 < cur_time-float(t) < 7200:
-                    return access_token
-                else:
-                    return self._save_access_token(cur_time)
-        except:
-            return self._save_access_token(cur_time)
-
-        """
-        发送消息(可以定义消息类型)，
-        匹配message的生成内容，可以定义一个创建消息类型的类build_message。
-        可以增加传递参数，touser,通过表单的内容获取
-        """
-    def send_message(self, message, msg_type,to_users):
-        url = f"https://qyapi.weixin.qq.com/cgi-bin/message/send?access_token={self.get_access_token()}"
-        send_values = {
-            "touser": to_users,
-            "msgtype": msg_type,
-            "agentid": conf_AGENTID,
-            msg_type: {
-                "content": message
-            },
-        }
-        send_message = (bytes(json.dumps(send_values,ensure_ascii=False), 'utf-8'))
-        res = requests.post(url, send_message)
-        return res.json()['errmsg']
-
-
-# 发送文件功能，暂不开放
-        
-        # 先将文件上传到临时媒体库
-        
-    def _upload_file(self, file):
-        url = f"https://qyapi.weixin.qq.com/cgi-bin/media/upload?access_token={self.get_access_token()}&type=file"
-        data = {"file": open(file, "rb")}
-        res = requests.post(url, files=data)
-        return res.json()['media_id']
+SEND_CONCURRENCY = 8 # 群发并发数，受接口频率限制约束
+SEND_PER_MINUTE = 6000 # 每分钟发送预算
+SEND_PER_HOUR = 100000 # 每小时发送预算
+FANOUT_SECTIONS = () # 分摊群发的配置节（如('app1', 'app2')），为空时只使用默认配置节
+AGGREGATE_WINDOW = 1000 # 内容相同行的合并窗口，为0时逐行发送
+RECIPIENT_TYPE = ID_USERID # 第一列的标识类型：'userid'、'mobile'、'email'、'alias'或'ext:自定义字段名'，非userid时发送前通过通讯录解析
+DEDUP_WINDOW = 4 * 3600 # 去重时间窗口（秒），窗口内不向同一用户重复发送相同内容，为0时不去重
+METRICS_FILE = '' # 群发结束后写入指标的文件名（如'metrics_{:%Y%m%d_%H%M%S}.json'），为空时不记录
+DEAD_LETTER_FILE = 'dead_letter_{:%Y%m%d_%H%M%S}.csv' # 死信文件名，按群发开始时间命名
+SHEET_CACHE = False # 打开表格时在后台缓存解析结果（表格文件名加.sheetcache），再次打开时直接读取；已有的有效缓存总会被使用
+
+# 配置管理对象，创建主窗口时初始化，导入本模块时不读写配置文件
+config_manager = None
+
+
+def render_markdown(text):
+    """markdown文本转HTML，markdown模块加载较慢，首次使用时才导入"""
+    from markdown import markdown # markdown文本转HTML支持
+    return markdown(text)
 
-        
-        # 发送文件
-        
-    def send_file(self, file):
-        media_id = self._upload_file(file) # 先将文件上传至临时媒体库
-        url = f"https://qyapi.weixin.qq.com/cgi-bin/message/send?access_token={self.get_access_token()}"
-        send_values = {
-            "touser": self.TOUSER,
-            "msgtype": "file",
-            "agentid": self.AGENTID,
-            "file": {
-                "media_id": media_id
-            },
-        }
-        send_message = (bytes(json.dumps(send_values,ensure_ascii=False), 'utf-8'))
-        res = requests.post(url, send_message)
-        return res.json()['errmsg']
 # 帮助窗口代码类
 class AboutWindow(Toplevel):
     def __init__(self, parent, text):
@@ -225,6 +80,7 @@ class AboutWindow(Toplevel):
         frame.pack(side=TOP, padx=20, pady=10, fill=BOTH, expand=1)
 
         # 使用HTMLScrolledText渲染HTML
+        from tkhtmlview import HTMLScrolledText # HTML渲染支持
         html_widget = HTMLScrolledText(frame)
         html_widget.pack(side=LEFT, fill=BOTH, expand=1)
         html_widget.set_html(self.text)
@@ -232,6 +88,56 @@ class AboutWindow(Toplevel):
         # closeButton = Button(self, text="关闭", width=10, command=self.cancel)
         # closeButton.pack(side=BOTTOM, padx=20, pady=10)
 
+    def cancel(self):
+        self.destroy()
+# 消息模板窗口代码类
+class TemplateWindow(Toplevel):
+    def __init__(self, parent, columns):
+        super().__init__(parent)
+        self.title("消息模板")
+        self.geometry("450x400")
+        self.resizable(False, False)
+        self.protocol("WM_DELETE_WINDOW", self.cancel)
+        # 计算弹出窗口相较主窗口左上角的坐标
+        self.geometry("+{}+{}".format(parent.winfo_x()+50, parent.winfo_y()))
+        self.parent = parent
+        self.columns = columns
+        self.transient(parent)
+        self.grab_set()
+        self.create_widgets()
+
+    def create_widgets(self):
+        hint = "可用占位符：" + " ".join(f"{{{name}}}" for name in self.columns) + "\n第一列为接收用户；使用自定义模板时标题与Markdown选项不生效。"
+        label = Label(self, text=hint, justify=LEFT, anchor="w", wraplength=410)
+        label.pack(side=TOP, fill=X, padx=20, pady=(10, 0))
+
+        frame = Frame(self)
+        frame.pack(side=BOTTOM, fill=X, padx=20, pady=(0, 10))
+        Button(frame, text="恢复默认", width=10, command=self.reset).pack(side=LEFT)
+        Button(frame, text="保存", width=10, command=self.save).pack(side=RIGHT)
+
+        self.text_widget = Text(self, font=("宋体", 12), undo=True)
+        self.text_widget.pack(side=TOP, fill=BOTH, expand=1, padx=20, pady=10)
+        template_text = self.parent.template_text
+        if template_text is None:
+            template_text = default_template_text(self.columns, status_var.get()==1, self.parent.current_title())
+        self.text_widget.insert('1.0', template_text)
+
+    def save(self):
+        text = self.text_widget.get('1.0', 'end-1c')
+        try:
+            # 保存前编译一次，提前发现未选择的列
+            MessageTemplate(text, self.columns)
+        except ValueError as e:
+            showerror("错误", str(e), parent=self)
+            return
+        self.parent.template_text = text
+        self.destroy()
+
+    def reset(self):
+        self.parent.template_text = None
+        self.destroy()
+
     def cancel(self):
         self.destroy()
 # 配置窗口代码类
@@ -380,57 +286,18 @@ class cfgmanager(Toplevel):
             showerror("错误", f"选择默认配置项失败：{str(e)}")
 
     def read_config(self):
-        # # 检查配置文件是否存在并进行处理
-        # if not os.path.exists(CONFIG_FILE):
-        #     # 文件不存在，提示用户是否创建新文件
-        #     res = askyesno('提示', '配置文件不存在，是否创建新的配置文件？')
-        #     if res:
-        #         # 用户确认创建新文件，使用tempfile模块生成一个随机的文件名
-        #         with tempfile.NamedTemporaryFile(mode='w', delete=False) as f:
-        #             new_file = f.name
-        #         # 将读取的config对象保存到新文件中
-        #         CONF_OBJ.read_dict({
-        #             # 'DEFAULT': {},
-        #             '配置项1': {
-        #                 'agentid': '',
-        #                 'cropid': '',
-        #                 'screctid': '',
-        #                 CONF_OBJ_default_section: 'False'
-        #             }
-        #         })
-        #         with open(new_file, 'w') as f:
-        #             CONF_OBJ.write(f)
-        #          # 重命名新文件，相当于剪切+粘贴，覆盖原来的配置文件
-        #         os.rename(new_file, CONFIG_FILE)
-        #         CONF_OBJ.read(CONFIG_FILE)
-        #     else:
-        #             return
-        # 文件存在，读取配置文件
-        # win.chk_config()
-        # win.init_chk()
-        CONF_OBJ.read(CONFIG_FILE)
-        # 清除列表框文件
-        self.widget_dic["tk_list_box_list_CfgItem"].delete(0, END)
-        
-        for section in CONF_OBJ.sections():
-            # 判断该section是否为默认选项
-            if CONF_OBJ.getboolean(section, CONF_OBJ_default_section):
-                self.widget_dic["tk_list_box_list_CfgItem"].insert(END, f'{section} (默认)') 
-                # 添加“(默认)”标志
-            else:
-                self.widget_dic["tk_list_box_list_CfgItem"].insert(END, section)
-            
-            # 列表排序
-            items = list(self.widget_dic["tk_list_box_list_CfgItem"].get(0, END))  # 获取所有选项
-            items.sort()  # 对选项进行排序
-            self.widget_dic["tk_list_box_list_CfgItem"].delete(0, END)  # 清空列表框
-            for item in items:
-                self.widget_dic["tk_list_box_list_CfgItem"].insert(END, item)  # 按照顺序添加排序后的选项
-        
+        # 配置文件被外部修改时重新加载，未修改时直接使用内存中的配置
+        config_manager.load_config()
+        self.refresh_list()
         win.init_chk()
 
-  
-
+    def refresh_list(self):
+        """按内存中已排序的配置节一次性刷新列表框"""
+        listbox = self.widget_dic["tk_list_box_list_CfgItem"]
+        listbox.delete(0, END)
+        # 默认配置项添加“(默认)”标志
+        listbox.insert(END, *[f'{section} (默认)' if config_manager.is_default(section) else section
+                              for section in config_manager.sections()])
 
     def show_config(self,event):
         """显示选中配置项的详细信息"""
@@ -538,7 +405,7 @@ class cfgmanager(Toplevel):
                 return
             
             # 检查是否为默认配置
-            if config_manager.config.getboolean(section, config_manager.default_section, fallback=False):
+            if config_manager.is_default(section):
                 showerror("错误", "不能删除默认配置项")
                 return
             
@@ -551,23 +418,8 @@ class cfgmanager(Toplevel):
             self.widget_dic["tk_input_text_CROPID"].delete(0, END)
             self.widget_dic["tk_input_text_CORPSECRET"].delete(0, END)
             
-            # 重新加载配置文件
-            config_manager.load_config()
-            
             # 刷新列表显示
-            self.widget_dic["tk_list_box_list_CfgItem"].delete(0, END)
-            for section in config_manager.config.sections():
-                if config_manager.config.getboolean(section, config_manager.default_section):
-                    self.widget_dic["tk_list_box_list_CfgItem"].insert(END, f'{section} (默认)')
-                else:
-                    self.widget_dic["tk_list_box_list_CfgItem"].insert(END, section)
-            
-            # 对列表项进行排序
-            items = list(self.widget_dic["tk_list_box_list_CfgItem"].get(0, END))
-            items.sort()
-            self.widget_dic["tk_list_box_list_CfgItem"].delete(0, END)
-            for item in items:
-                self.widget_dic["tk_list_box_list_CfgItem"].insert(END, item)
+            self.refresh_list()
             
             showinfo("成功", "配置项删除成功")
         except Exception as e:
@@ -578,13 +430,13 @@ class cfgmanager(Toplevel):
         section = self.widget_dic["tk_list_box_list_CfgItem"].get(self.widget_dic["tk_list_box_list_CfgItem"].curselection()).replace(' (默认)', '')
 
         # 更新config文件，将选中的section设置为默认，并保存修改
-        for section_name in CONF_OBJ.sections():
+        # 通过config_manager写入，保证发送类读取到的默认配置与界面一致
+        for section_name in config_manager.config.sections():
             if section_name == section:
-                CONF_OBJ[section_name][CONF_OBJ_default_section] = "true"
+                config_manager.config[section_name][config_manager.default_section] = "true"
             else:
-                CONF_OBJ[section_name][CONF_OBJ_default_section] = "false"
-        with open(CONFIG_FILE, 'w') as configfile:
-            CONF_OBJ.write(configfile)
+                config_manager.config[section_name][config_manager.default_section] = "false"
+        config_manager.save_config()
 
          # 清空列表框并重新添加更新后的config文件中的section
         self.read_config()
@@ -636,7 +488,8 @@ class WinGUI(Tk):
         self.__create_listbox()
         self.__create_buttons()
         self.__create_labels()
-        self.__create_text()
+        # 预览栏依赖的HTML渲染模块加载较慢，主窗口显示后再创建
+        self.after_idle(self.__create_text)
         self.__other_adapter()
 
     def __win(self):
@@ -746,6 +599,7 @@ class WinGUI(Tk):
     # 文本框创建函数
     def __create_text(self):
         # self.widgets["text_Preview"] = Text(self, font=("宋体", 12), state="disabled")
+        from tkhtmlview import HTMLScrolledText # HTML渲染支持
         self.widgets["text_Preview"] = HTMLScrolledText(self, bg='SystemButtonFace',font=("宋体", 12), state="disabled")
         self.widgets["text_Preview"].place(x=390, y=60, width=300, height=260)
         
@@ -791,10 +645,21 @@ class Win(WinGUI):
     file_status=0
 
     def __init__(self):
+        global config_manager
         super().__init__()
+        config_manager = get_config_manager(CONFIG_FILE, on_error=lambda message: showerror("错误", message))
+        metrics.enable(bool(METRICS_FILE))
+        self.about_html = None # 渲染后的关于信息，(文件修改时间, HTML)
         self.menu = self.create_menu()
         self.config(menu=self.menu)
-        self.Preview_table = []
+        self.preview_pager = None # 预览分页读取对象，按需读取所选列的数据行
+        self.Preview_columns = () # 预览数据对应的列名
+        self.Preview_read_items = () # 预览读取的列名，附件列位于所选列之后
+        self.sheet_reader = None # 打开文件时创建、尚未读取数据行的读取对象
+        self.batch_sender = None
+        self.rate_limiter = RateLimiter(SEND_PER_MINUTE, SEND_PER_HOUR) # 跨批次共用发送预算
+        self.template_text = None # 自定义消息模板，为None时使用默认格式
+        self.attachment_column = None # 附件路径所在列，为None时不发送附件
         self.after(100,self.chk_config)
         self.after(100,self.conf_reload)
         # self.widgets["msg_format_set"].variavle.get
@@ -812,6 +677,9 @@ class Win(WinGUI):
         menu = Menu(self, tearoff=False)
         file_menu = Menu(menu, tearoff=False)
         file_menu.add_command(label="打开消息素材文件...", command=self.menu_Openfile)
+        file_menu.add_command(label="编辑消息模板...", command=self.menu_Template)
+        file_menu.add_command(label="设置附件列...", command=self.menu_Attachment)
+        file_menu.add_command(label="重发失败消息...", command=self.menu_Resend)
         file_menu.add_separator()
         file_menu.add_command(label="退出", command=self.menu_Quit)
         menu.add_cascade(label="文件", menu=file_menu)
@@ -827,11 +695,54 @@ class Win(WinGUI):
         seeting_window = cfgmanager(win)
         seeting_window.grab_set()
 
+    def menu_Template(self):
+        columns = self.selected_columns()
+        if len(columns) < 2:
+            showinfo("提示", "请先选定用户字段和使用的信息列。")
+            return
+        template_window = TemplateWindow(win, columns)
+        template_window.grab_set()
+
+    def menu_Attachment(self):
+        header = self.widgets["lb_All_Item"].get(0, END)
+        if self.file_status == 0 or not header:
+            showinfo("提示", "请先打开数据表格。")
+            return
+        column = askstring("附件列", f"请输入附件路径所在列名，留空则不发送附件。\n可用列：{'、'.join(header)}",
+                           initialvalue=self.attachment_column or '')
+        if column is None:
+            return
+        column = column.strip()
+        if column and column not in header:
+            showerror("错误", f"数据表格中没有列：{column}")
+            return
+        self.attachment_column = column or None
+
+    def menu_Resend(self):
+        if self.batch_sender is not None and self.batch_sender.is_running():
+            showinfo("提示", "群发任务正在进行中，请稍候")
+            return
+        path = askopenfilename(filetypes=(("死信文件", "dead_letter_*.csv"), ("CSV文件", "*.csv")))
+        if not path:
+            return
+        try:
+            jobs = list(iter_dead_letters(path))
+        except Exception as e:
+            showerror("错误", str(e))
+            return
+        if not jobs:
+            showinfo("提示", "文件中没有需要重发的消息")
+            return
+        if askyesno("提示", f"是否重发{len(jobs)}条失败消息?"):
+            self.start_batch(WeChat(config_manager=config_manager), jobs, len(jobs))
+
     def menu_About(self):
-        with open(README_FILE, 'r') as file:
-            md_text = file.read()
-            text = markdown(md_text)
-        about_window = AboutWindow(win, text)
+        # 关于信息只在文件修改后重新渲染
+        mtime = os.path.getmtime(README_FILE)
+        if self.about_html is None or self.about_html[0] != mtime:
+            with open(README_FILE, 'r', encoding='utf-8') as file:
+                self.about_html = (mtime, render_markdown(file.read()))
+        about_window = AboutWindow(win, self.about_html[1])
         about_window.grab_set()
 
     def menu_Quit(self):
@@ -840,31 +751,49 @@ class Win(WinGUI):
     def menu_Openfile(self):
         # global file_path   # 使用全局变量
     # 打开文件选择对话框
-        self.file_path = askopenfilename(filetypes=(("Excel files", "*.xls"), ("所有文件", "*.*")))
+        patterns = " ".join(f"*{extension}" for extension in supported_extensions())
+        self.file_path = askopenfilename(filetypes=(("表格文件", patterns), ("所有文件", "*.*")))
         if not self.file_path:
             self.file_status=0
             return
         # 加载工资文件
         try:
-            workbook = xlrd.open_workbook(self.file_path)
-            sheet_names = workbook.sheet_names()
-            if not sheet_names:
-                showerror("错误", "无效的Excel文件")
+            if self.sheet_reader is not None:
+                self.sheet_reader.close()
+                self.sheet_reader = None
+            reader = open_sheet(self.file_path)
+            # 获取表头
+            header = reader.header
+            if not header:
+                reader.close()
+                showerror("错误", "无效的表格文件")
                 self.file_status=0
                 return
-            sheet = workbook.sheet_by_name(sheet_names[0])
-            # 获取表头
-            header = [cell.value for cell in sheet.row(0)]
+            # 保留读取对象，生成预览时复用同一句柄读取数据行
+            self.sheet_reader = reader
+            self.attachment_column = None
             # 更新列表项
             self.widgets["lb_All_Item"].delete(0, END)
             for h in header:
                 self.widgets["lb_All_Item"].insert(END, h)
             self.file_status=1
+            self.build_sheet_cache(self.file_path)
         except Exception as e:
             showerror("错误", str(e))
             self.file_status=0
             return
         
+    # 启用SHEET_CACHE时在后台生成表格解析结果缓存，之后的预览与群发直接读取缓存，不再重新解析
+    def build_sheet_cache(self, file_path):
+        if not SHEET_CACHE or os.path.splitext(file_path)[1].lower() not in CACHED_EXTENSIONS:
+            return
+        def work():
+            try:
+                ensure_sidecar(file_path)
+            except Exception as e:
+                logging.warning(f"生成表格缓存失败：{e}")
+        threading.Thread(target=work, daemon=True).start()
+
     def btn_ItemAdd_click(self):
         selected_items = self.widgets["lb_All_Item"].curselection()  # 获取选中的列表项
         for index in selected_items:
@@ -906,15 +835,18 @@ class Win(WinGUI):
         self.widgets["lb_User_Item"].activate(END)
         self.widgets["lb_User_Item"].selection_set(END)
 
+    @metrics.timed('preview')
     def btn_GeneratePreview_click(self):
         # self.Preview_items = [self.widgets["lb_Select_Item"].get(i) for i in self.widgets["lb_Select_Item"].curselection()]  # 获取选择的列表项
-        self.Preview_table=[]
+        if self.preview_pager is not None:
+            self.preview_pager.close()
+            self.preview_pager = None
         # self.current_row_index=1
         User_check_items=self.widgets["lb_User_Item"].get(0, END)
         MsgBody_check_items=self.widgets["lb_Select_Item"].get(0, END)
-        Preview_items = User_check_items+MsgBody_check_items
+        Preview_items = self.selected_columns()
         if self.file_status==0:
-            result = askyesno("提示", "未打开任何xls数据表格，是否打开?")
+            result = askyesno("提示", "未打开任何数据表格，是否打开?")
             if result:
                 self.menu_Openfile()
                 return
@@ -930,69 +862,71 @@ class Win(WinGUI):
             showinfo("提示", "缺少信息主体！请选定好使用的信息列。")
             return
         try:
-            with open(self.file_path, 'rb') as f:
-                Preview_workbook = xlrd.open_workbook(file_contents=f.read())
-                Preview_sheet = Preview_workbook.sheet_by_index(0)
-                   # 获取数据子集
-            for Preview_sheet_row_index in range(Preview_sheet.nrows):
-                Preview_table_convert = {}
-                for Preview_sheet_column_name in Preview_items:
-                    if Preview_sheet_column_name not in Preview_sheet.row_values(0):
-                        showerror("提示", '打开的文件中未能找到对应的列.')
-                    Preview_sheet_column_index = Preview_sheet.row_values(0).index(Preview_sheet_column_name)
-                    cell_value = Preview_sheet.cell_value(Preview_sheet_row_index, Preview_sheet_column_index)
-                    Preview_table_convert[Preview_sheet_column_name] = cell_value
-                self.Preview_table.append(Preview_table_convert)
-            self.current_row_index=1 #给出预览索引初始位置
+            # 先编译模板，提前发现模板中未选择的列
+            self.build_template(Preview_items)
+            # 表头映射只解析一次，逐行读取所选列的数据子集
+            # 附件列读取在所选列之后，不参与消息渲染
+            read_items = Preview_items + ((self.attachment_column,) if self.attachment_column else ())
+            # 只读取当前显示所在的一页数据，其余行在翻页时按需读取
+            file_path = self.file_path
+            pager = PreviewPager(self.take_sheet_reader(), lambda: open_sheet(file_path), read_items)
+            self.preview_pager = pager
+            self.Preview_columns = Preview_items
+            self.Preview_read_items = read_items
+            if pager.row(0) is None:
+                showinfo("提示", "数据表格中没有可用的数据行")
+                return False
+            self.current_row_index=0 #给出预览索引初始位置
             self.show_row()  
+            return True
         except Exception as e:
             showerror("提示", str(e))
+            return False
+
+    # 已选择的列：接收用户列在前，信息列在后
+    def selected_columns(self):
+        return self.widgets["lb_User_Item"].get(0, END) + self.widgets["lb_Select_Item"].get(0, END)
+
+    def current_title(self):
+        return self.format_title_info if title_var.get()==1 else None
+
+    # 按界面选项编译消息模板，自定义模板优先
+    def build_template(self, columns):
+        if self.template_text is not None:
+            return MessageTemplate(self.template_text, columns)
+        return MessageTemplate.default(columns, status_var.get()==1, self.current_title())
+
+    # 取得表格读取对象，优先复用打开文件时已解析表头的读取对象
+    def take_sheet_reader(self):
+        reader, self.sheet_reader = self.sheet_reader, None
+        return reader or open_sheet(self.file_path)
 
     # 显示table的行数据
+    @metrics.timed('show_row')
     def show_row(self):
-        format_status = status_var.get()
-        # 逻辑判断标题栏复选框并作出
-        if title_var.get()==1:
-            self.row_str=self.format_title_info+'\n' #携带非空标题
-            # 界定插入行的标记
-            row_replace=1
-        else:
-            self.row_str='\n' #携带空标题
-            # 界定插入行的标记
-            row_replace=1
-        # self.row_str = ''
-        for key, value in self.Preview_table[self.current_row_index].items():
-            # self.row_str += f"{key}: {value}\n" # 原始数据形态
-            # markdown自定义后形态判定
-            if format_status==1:
-                # 携带markdown格式标记
-                # self.row_str += f"> <font color=\"info\">**{key}**</font>: {value}  \n"
-                self.row_str += f"> **<font color=\"info\">{key}</font>**: {value}  \n"
-            else:
-                # 不携带markdown标记
-                self.row_str += f"{key}: {value}  \n"
-            # 另外一种markdown格式形式样式
-            # self.row_str += f"### <font color=\"info\">**{key}**</font>: *{ value }*  \n"
-        self.row_str += f'{COPYRIGHT_INFO}  \n'
-        # 获取第一个键值的值，作为touser的用户名
-        self.to_users = self.Preview_table[self.current_row_index][list(self.Preview_table[self.current_row_index].keys())[0]]
-        # 文本预览插入非发送字符的提示和标记，定位在row_replace定义的行数，识别以两个空格+\n结尾的字符。
-        self.row_str = self.row_str.replace('  \n', '  \n ---(接收用户，此行不作为发送信息)---  \n', row_replace)
-        # 消息主体保留第一行，不保留第二、三行，包括接收者以及接受着注释
-        self.current_message = '\n'.join(self.row_str.split('\n')[:1] + self.row_str.split('\n')[3:])
-        # self.current_message = '  \n'.join(self.row_str.split('  \n')[2:])        
-        self.widgets["text_Preview"].set_html(markdown(self.row_str)) #显示在预览栏目里的信息主体
+        pager = self.preview_pager
+        values = pager.row(self.current_row_index)
+        template = self.build_template(self.Preview_columns)
+        self.to_users = values[0]
+        self.current_message = template.render(values)
+        # 渲染结果按模板缓存，模板或显示选项变化后自动重新渲染
+        render = lambda row: render_markdown(template.render_preview(row))
+        self.widgets["text_Preview"].set_html(pager.html(self.current_row_index, render, template.text)) #显示在预览栏目里的信息主体
+        pager.prefetch(self.current_row_index, render, template.text)
 
 
     def btn_PreviousPage_click(self):
         try:
-            if self.current_row_index > 1:
+            if self.current_row_index > 0:
                 self.current_row_index -= 1
                 self.show_row()
             else:
                 showinfo("提示", "无向上数据")
         except AttributeError:
             self.btn_GeneratePreview_click()
+        except (IndexError, KeyError):
+            # 空表格或模板与所选列不一致时无法渲染
+            showinfo("提示", "无预览数据，请确认是否具有预览数据")
 
         # 其他实现途径，已被优化。
         # current_row = int(self.widgets["text_Preview"].index("end-1c").split('.')[0])  # 获取当前显示的最后一行的行号
@@ -1005,116 +939,266 @@ class Win(WinGUI):
         # if not self.current_row_index:
         #     self.btn_GeneratePreview_click()
         try:
-            if self.current_row_index < len(self.Preview_table)-1:
+            if self.preview_pager.row(self.current_row_index + 1) is not None:
                 self.current_row_index += 1
                 self.show_row()
             else:
                 showinfo("提示", "无向下数据")
         except AttributeError:
             self.btn_GeneratePreview_click()
+        except (IndexError, KeyError):
+            showinfo("提示", "无预览数据，请确认是否具有预览数据")
 
 
     def init_chk(self):
         global conf_AGENTID,conf_CROPID,conf_SCRECTID
-        CONF_OBJ = configparser.ConfigParser()
-        CONF_OBJ.read(CONFIG_FILE)
-        default_values = set()   #集合中存储所有默认值
-        default_count = 0   #存储value为true的DEFAULT_SECTION_VALUE的数量
-        default_sections = []   #存储value为true的DEFAULT_SECTION_VALUE的DEFAULT_SECTION
-        for section in CONF_OBJ.sections():
-            if CONF_OBJ.has_option(section, CONF_OBJ_default_section):
-                chk_value = CONF_OBJ.get(section, CONF_OBJ_default_section)
-                if chk_value == "true":
-                    default_values.add(chk_value)
-                    default_count += 1
-                    default_sections.append(section)
-        if default_count == 0:
+        # 使用共用的配置管理对象，配置文件未变化时不重新解析
+        config_manager.load_config()
+        default_sections = config_manager.default_sections()   #存储value为true的DEFAULT_SECTION_VALUE的DEFAULT_SECTION
+        if not default_sections:
             showinfo("提示", "无默认配置项，进行默认设置.")
             return 1
-        elif default_count == 1:
-            if CONF_OBJ.get(default_sections[0], CONF_OBJ_default_section) == "true":
-                cfg_default_section = default_sections[0]
-                conf_AGENTID = CONF_OBJ.get(cfg_default_section, "agentid")
-                conf_CROPID = CONF_OBJ.get(cfg_default_section, "cropid")
-                conf_SCRECTID = CONF_OBJ.get(cfg_default_section, "screctid")
-                # showinfo("提示", "配置数据读取完成")
-                self.widgets["status_bar"].config(text="当前配置文件为：" + CONFIG_FILE+"； 当前配置项为：" + cfg_default_section)
-                # 创建发送类对象，并引用全局变量conf_AGENTID、conf_CROPID、conf_SCRECTID
-                # self.mod_sending =WeChat()
-                print(conf_AGENTID,conf_CROPID,conf_SCRECTID)
-                return 0
-            else:
-                showinfo("错误", "无法读取默认配置项")
-                return 1
-        elif default_count > 1:
+        elif len(default_sections) == 1:
+            cfg_default_section = default_sections[0]
+            settings = config_manager.config[cfg_default_section]
+            conf_AGENTID = settings.get("agentid", "")
+            conf_CROPID = settings.get("cropid", "")
+            conf_SCRECTID = settings.get("screctid", "")
+            self.widgets["status_bar"].config(text="当前配置文件为：" + CONFIG_FILE+"； 当前配置项为：" + cfg_default_section)
+            return 0
+        else:
             default_text = " ".join(default_sections)
             showinfo("提示", "存在多个默认选项，请从以下分区中选择一个配置为默认：\n\n{}".format(default_text))
             return 1
 
 
     def chk_config(self):
-        # 检查配置文件是否存在并进行处理
-        if not os.path.exists(CONFIG_FILE):
-            # 文件不存在，提示用户是否创建新文件
-            showinfo('提示', '配置文件不存在，即将创建新的配置文件。')
-            # 用户确认创建新文件，使用tempfile模块生成一个随机的文件名
-            with tempfile.NamedTemporaryFile(mode='w', delete=False) as f:
-                new_file = f.name
-            # 将读取的config对象保存到新文件中
-            CONF_OBJ.read_dict({
-            # 'DEFAULT': {},
-                write_item_section: {
-                    write_item_agentid: '',
-                    write_item_cropid: '',
-                    write_item_screctid: '',
-                    CONF_OBJ_default_section: 'true'
-                }
-            })
-            with open(new_file, 'w') as f:
-                CONF_OBJ.write(f)
-                # 重命名新文件，相当于剪切+粘贴，覆盖原来的配置文件
-            os.rename(new_file, CONFIG_FILE)
-
-        else:
-            return
-        # 文件存在，读取配置文件
+        # 配置文件不存在时已由配置管理对象在加载时原子写入默认配置，此处提示用户
+        if config_manager.created:
+            showinfo('提示', '配置文件不存在，已创建新的配置文件。')
 
     def msg_single_send(self):
         # 创建发送类对象，并引用全局变量conf_AGENTID、conf_CROPID、conf_SCRECTID
-        self.mod_sending =WeChat() 
-        # self.mod_sending._get_access_token()       
         try:
-            self.mod_sending.send_message(self.current_message,'markdown',self.to_users)
-            self.widgets["process_bar"].config(text="消息已发送至self.to_users，发送完成")
-            self.widgets["process_bar_line"]['value']=100
-        except AttributeError:
+            self.mod_sending =WeChat(config_manager=config_manager)
+            # self.mod_sending._get_access_token()       
+            to_users, message = self.to_users, self.current_message
+        except (AttributeError, IndexError, KeyError):
             # self.btn_GeneratePreview_click()
             showinfo("提示", "无预览数据，请确认是否具有预览数据")
+            return
+        except Exception as e:
+            logging.error(f"单条发送失败：{e}")
+            showerror("错误", f"发送失败：{str(e)}")
+            return
+        if RECIPIENT_TYPE == ID_USERID:
+            self.send_single(message, to_users)
+            return
+        def on_resolved(recipients, unresolved):
+            userid = recipients.get(normalize_identifier(to_users))
+            if userid is None:
+                showerror("错误", f"接收用户{to_users}无法解析，请确认通讯录中存在该用户")
+                return
+            self.send_single(message, userid, to_users)
+        self.resolve_recipients([(self.current_row_index + 1, to_users)], on_resolved)
 
-        return
+    # 发送单条消息并在状态栏显示结果
+    def send_single(self, message, to_users, display_users=None):
+        try:
+            result = self.mod_sending.send_message(message,'markdown',to_users)
+            if result.get('errcode') != 0:
+                showerror("错误", f"发送失败：{result.get('errmsg')}")
+                return
+            self.widgets["process_bar"].config(text=f"消息已发送至{display_users or to_users}，发送完成")
+            self.widgets["process_bar_line"]['value']=100
+        except Exception as e:
+            logging.error(f"单条发送失败：{e}")
+            showerror("错误", f"发送失败：{str(e)}")
 
     def msg_list_send(self):
+        if self.batch_sender is not None and self.batch_sender.is_running():
+            showinfo("提示", "群发任务正在进行中，请稍候")
+            return
         # 创建发送类对象，并引用全局变量conf_AGENTID、conf_CROPID、conf_SCRECTID
-        self.mod_sending =WeChat() 
-        # decide_push=0
-        # self.mod_sending._get_access_token()
-        self.btn_GeneratePreview_click()
-        self.send_range=len(self.Preview_table)
+        self.mod_sending =WeChat(config_manager=config_manager)
+        if not self.btn_GeneratePreview_click():
+            return
         result = askyesno("提示", "是否批量发送?")        
-        if result:
-            for i in range(1, self.send_range):
-                # self.to_users = self.Preview_table[self.current_row_index][list(self.Preview_table[self.current_row_index].keys())[0]]
-                self.current_row_index =i
-                self.show_row()
-                self.mod_sending.send_message(self.current_message,'markdown',self.to_users) 
-                
-                # 延时函数中插入插入进度条函数，带入当前i的值以及范围值
-                self.after(100,self.process_bar_moving(i,self.send_range))
-                # self.widgets["process_bar"].config(text=f"消息已发送至{self.to_users}，发送完成。当前第{i}位/总共{len(self.Preview_table)-1}位")
-                # self.widgets["process_bar_line"]['value']=i/self.send_range*100
-                # time.sleep(0.2)
-        else:
+        if not result:
+            return
+        if RECIPIENT_TYPE == ID_USERID:
+            self.confirm_batch(None, 0)
+            return
+        file_path = self.file_path
+        user_column = self.Preview_columns[:1]
+        # 单独读取一遍接收用户列，行号与发送时一致；读取在后台线程中进行
+        def iter_recipients():
+            with open_sheet(file_path) as reader:
+                yield from enumerate((values[0] for values in reader.iter_rows(user_column)), start=1)
+        def on_resolved(recipients, unresolved):
+            if self.file_path != file_path:
+                showinfo("提示", "解析接收用户期间已打开其他表格，请重新群发")
+                return
+            if unresolved:
+                sample = "、".join(f"第{row_index}行 {value}" for row_index, value in unresolved[:10])
+                if not askyesno("提示", f"{len(unresolved)}行接收用户无法解析：{sample}\n是否跳过这些行继续发送?"):
+                    return
+            self.confirm_batch(recipients, len(unresolved))
+        self.resolve_recipients(iter_recipients(), on_resolved)
+
+    # 确认是否断点续发后启动群发，recipients为接收用户标识 -> userid，skipped为无法解析而跳过的行数
+    def confirm_batch(self, recipients, skipped):
+        # 存在上次群发的成功记录时，询问是否断点续发
+        journal_path = self.file_path + JOURNAL_SUFFIX
+        resume, resend_all = False, False
+        if has_delivered_records(journal_path):
+            resume = askyesno("提示", "检测到该表格的群发记录，是否跳过已成功发送的行?\n选择“否”将重新发送全部。")
+            resend_all = not resume
+        try:
+            journal = SendJournal(journal_path, resume)
+        except OSError as e:
+            showerror("错误", f"无法创建群发日志：{str(e)}")
             return
+        # 模板在界面线程中按当前选项编译一次，消息在后台线程中逐行渲染
+        template = self.build_template(self.Preview_columns)
+        file_path = self.file_path
+        read_items = self.Preview_read_items
+        render_row = JobRenderer(template, 'markdown', len(self.Preview_columns), os.path.dirname(os.path.abspath(file_path)),
+                                 recipients)
+        # 表格读取与消息渲染在流水线线程中进行，经有界队列交给发送线程，不在内存中保留整张表格
+        def iter_jobs():
+            with open_sheet(file_path) as reader:
+                rows = metrics.timed_iter('sheet_read', reader.iter_rows(read_items))
+                yield from staged(enumerate(rows, start=1), render_row)
+        # 行数取自表格读取对象，流式读取的表格在预览读到末尾前行数未知；带附件时每行的消息数不定，进度总数未知
+        total = None if self.attachment_column or self.preview_pager.row_count is None else self.preview_pager.row_count - skipped
+        # 选择重新发送全部时不做重复消息抑制，否则近期发送过的行仍会被跳过
+        self.start_batch(self.mod_sending, iter_jobs(), total, journal, dedup=not resend_all)
+
+    # 在后台线程中同步本地通讯录索引（过期时）并解析接收用户，不阻塞界面；
+    # 完成后在界面线程中以 (标识 -> userid, [(行号, 标识), ...] 无法解析的行) 调用on_resolved，失败时提示错误
+    def resolve_recipients(self, rows, on_resolved):
+        sender = self.mod_sending
+        def work():
+            directory = RecipientDirectory(DIRECTORY_FILE)
+            try:
+                directory.sync(sender)
+                return check_recipients(rows, directory, RECIPIENT_TYPE)
+            finally:
+                directory.close()
+        def done(result, error):
+            self.set_send_buttons(NORMAL)
+            bar = self.widgets["process_bar_line"]
+            bar.stop()
+            bar.config(mode='determinate')
+            self.widgets["process_bar"].config(text="")
+            if error is not None:
+                showerror("错误", f"解析接收用户失败：{str(error)}")
+                return
+            on_resolved(*result)
+        self.set_send_buttons(DISABLED)
+        self.widgets["process_bar"].config(text="正在解析接收用户...")
+        self.widgets["process_bar_line"].config(mode='indeterminate')
+        self.widgets["process_bar_line"].start(20)
+        self.run_background(work, done)
+
+    def set_send_buttons(self, state):
+        self.widgets["btn_Send"].config(state=state)
+        self.widgets["btn_Send2"].config(state=state)
+
+    # 在后台线程中运行work，完成后在界面线程中以 (结果, 异常) 调用on_done
+    def run_background(self, work, on_done):
+        outcome = queue.Queue()
+        def target():
+            try:
+                outcome.put((work(), None))
+            except Exception as e:
+                outcome.put((None, e))
+        def poll():
+            try:
+                result, error = outcome.get_nowait()
+            except queue.Empty:
+                self.after(100, poll)
+                return
+            on_done(result, error)
+        threading.Thread(target=target, daemon=True).start()
+        self.after(100, poll)
+
+    # 启动后台群发，失败消息按重试策略重试，最终失败的写入死信文件
+    def start_batch(self, sender, jobs, total, journal=None, dedup=True):
+        accounts = None
+        try:
+            if len(FANOUT_SECTIONS) > 1:
+                accounts = build_accounts(FANOUT_SECTIONS, config_manager, SEND_PER_MINUTE, SEND_PER_HOUR, SEND_CONCURRENCY)
+                sender = accounts[0].sender
+            else:
+                # 共享连接池不小于并发数，否则超出的发送线程会阻塞等待连接
+                get_http_session(http_pool_size(SEND_CONCURRENCY))
+            # 预先获取令牌，避免并发线程同时刷新
+            for account_sender in [account.sender for account in accounts] if accounts else [sender]:
+                account_sender.get_access_token()
+        except Exception as e:
+            showerror("错误", f"获取访问令牌失败：{str(e)}")
+            if journal is not None:
+                journal.close()
+            return
+        dead_letter = DeadLetterWriter(DEAD_LETTER_FILE.format(datetime.datetime.now()))
+        try:
+            dedup = DedupIndex(DEDUP_FILE, DEDUP_WINDOW) if dedup and DEDUP_WINDOW > 0 else None
+        except Exception as e:
+            # 去重索引不可用时仍可发送，仅失去重复抑制
+            logging.warning(f"打开去重索引失败：{e}")
+            dedup = None
+        self.batch_sender = BatchSender(sender, SEND_CONCURRENCY, self.rate_limiter, RetryPolicy(), dead_letter, journal,
+                                        AGGREGATE_WINDOW, dedup, MediaUploader(sender), accounts)
+        self.batch_sender.start(jobs, total)
+        self.widgets["btn_Send2"].config(state=DISABLED)
+        bar = self.widgets["process_bar_line"]
+        bar['value'] = 0
+        if total is None:
+            # 总数未知时进度条只显示正在发送
+            bar.config(mode='indeterminate')
+            bar.start(20)
+        self.after(100, self.poll_send_progress)
+
+    # 轮询群发进度队列并刷新进度条
+    def poll_send_progress(self):
+        try:
+            while True:
+                event = self.batch_sender.progress_queue.get_nowait()
+                if event[0] == EVENT_PROGRESS:
+                    _, finished, total, _, to_users, ok, _ = event
+                    self.process_bar_moving(finished, total, to_users)
+                else:
+                    self.batch_send_done(event[1])
+                    return
+        except queue.Empty:
+            pass
+        self.after(100, self.poll_send_progress)
+
+    def batch_send_done(self, summary):
+        self.widgets["btn_Send2"].config(state=NORMAL)
+        self.widgets["process_bar_line"].stop()
+        self.widgets["process_bar_line"].config(mode='determinate')
+        if not summary['error']:
+            self.widgets["process_bar_line"]['value']=100
+        if METRICS_FILE:
+            try:
+                metrics.export(METRICS_FILE.format(datetime.datetime.now()), 'prometheus' if METRICS_FILE.endswith('.prom') else 'json')
+            except OSError as e:
+                logging.warning(f"写入指标文件失败：{e}")
+            metrics.reset()
+        for name, counts in summary.get('accounts', {}).items():
+            logging.info(f"应用{name}：成功{counts['sent']}位，失败{counts['failed']}位")
+        dead_letter_info =f"\n失败消息已保存至：{summary['dead_letter']}，可通过“重发失败消息”重新发送。" if summary.get('dead_letter') else ""
+        if summary['error']:
+            showerror("错误", f"群发中断：{summary['error']}\n已成功{summary['sent']}位，失败{summary['failed']}位。{dead_letter_info}")
+        elif summary['failed']:
+            failed_users = "、".join(str(to_users) for _, to_users, _ in summary['failures'][:10])
+            showerror("提示", f"群发完成：成功{summary['sent']}位，失败{summary['failed']}位。\n失败用户：{failed_users}{dead_letter_info}")
+        else:
+            skipped_info = f"，跳过已发送{summary['skipped']}位" if summary['skipped'] else ""
+            showinfo("提示", f"群发完成：共发送{summary['sent']}位{skipped_info}")
     
     def set_title_info(self):
         global title_info
@@ -1128,11 +1212,31 @@ class Win(WinGUI):
             self.format_title_info=''
     
 
-    def process_bar_moving(self,process_bar_value,process_bar_send_range):
-        self.widgets["process_bar"].config(text=f"{self.to_users}已发送，第{process_bar_value}位/共{process_bar_send_range-1}位")
-        self.widgets["process_bar_line"]['value']=process_bar_value/(process_bar_send_range-1)*100
+    def process_bar_moving(self,process_bar_value,process_bar_total,to_users):
+        if not process_bar_total:
+            # 总数未知时只显示已发送数
+            self.widgets["process_bar"].config(text=f"{to_users}已发送，第{process_bar_value}位")
+            return
+        self.widgets["process_bar"].config(text=f"{to_users}已发送，第{process_bar_value}位/共{process_bar_total}位")
+        self.widgets["process_bar_line"]['value']=process_bar_value/process_bar_total*100
         
 
-if __name__ == "__main__":
+def main():
+    global win
+    # 配置日志处理
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.StreamHandler(sys.stdout)
+        ]
+    )
+    # 重定向标准错误输出到/dev/null以过滤系统级别的提示信息
+    if sys.platform == 'darwin':
+        sys.stderr = open(os.devnull, 'w')
     win = Win()
-    win.mainloop()
\ No newline at end of file
+    win.mainloop()
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,282 @@
+# 群发调度引擎
+# 在有界线程池中并发执行发送任务，通过线程安全队列向界面回报进度
+import queue # 线程安全队列支持
+import threading # 线程支持
+import logging
+import time # 时间操作支持
+from concurrent.futures import ThreadPoolExecutor # 线程池支持
+from rate_limiter import THROTTLE_ERRCODES # 限流错误码
+from send_journal import content_hash # 群发日志内容摘要
+from recipient_batcher import aggregate, split_users # 接收用户合并
+from dedup_index import message_hash # 去重消息摘要
+from media_cache import MSG_TYPE_FILE, MEDIA_EXPIRED_ERRCODES # 临时素材缓存
+from metrics import metrics # 发送链路指标
+from multi_account import Account, route # 多应用分摊群发
+
+DEFAULT_CONCURRENCY = 8 # 默认并发数
+THROTTLE_MAX_REQUEUE = 10 # 单条消息因限流重新排队的最大次数
+SKIPPED_DETAIL = '已发送，跳过' # 断点续发时跳过行的结果说明
+DUPLICATE_DETAIL = '近期已发送相同内容，跳过' # 去重跳过行的结果说明
+
+# 进度事件类型
+EVENT_PROGRESS = 'progress' # 单条发送完成：(类型, 已完成数, 总数, 行号, 接收用户, 是否成功, 结果说明)
+EVENT_DONE = 'done' # 全部发送结束：(类型, 汇总信息)
+
+
+class BatchSender:
+    """群发调度类
+
+    Args:
+        sender: 具有 send_message(message, msg_type, to_users) 方法的发送对象，返回接口结果字典
+        concurrency: 同时在途的最大发送数
+        rate_limiter: 发送限速器，为None时不限速
+        retry_policy: 重试策略，为None时失败不重试
+        dead_letter: 死信文件写入对象，最终失败的消息写入其中
+        journal: 群发日志，记录每行结果并跳过其中已成功发送的行
+        aggregate_window: 内容相同行的合并窗口，为0时逐行发送
+        dedup: 发送去重索引，时间窗口内向同一用户发送过的相同内容直接跳过，并开启服务端重复消息检查
+        media: 附件上传调度对象，附件任务提交时即开始后台上传，为None时不支持附件任务
+        accounts: 参与分摊的应用列表，指定时按接收用户分摊到各应用，忽略sender、rate_limiter与media
+    """
+    def __init__(self, sender, concurrency=DEFAULT_CONCURRENCY, rate_limiter=None, retry_policy=None, dead_letter=None, journal=None,
+                 aggregate_window=0, dedup=None, media=None, accounts=None):
+        self.sender = sender
+        self.concurrency = max(1, int(concurrency))
+        self.rate_limiter = rate_limiter
+        self.retry_policy = retry_policy
+        self.dead_letter = dead_letter
+        self.journal = journal
+        self.aggregate_window = aggregate_window
+        self.dedup = dedup
+        self.media = media
+        self.accounts = list(accounts) if accounts else [Account('', sender, rate_limiter, media)]
+        self.progress_queue = queue.Queue()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self, jobs, total):
+        """在后台线程中启动群发，立即返回
+
+        Args:
+            jobs: 可迭代的 (row_index, message, msg_type, to_users) 任务
+            total: 任务总数，用于进度计算，未知时为None
+        """
+        if self.is_running():
+            raise RuntimeError("群发任务正在进行中")
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, args=(jobs, total), daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """请求停止，已提交的发送仍会完成"""
+        self._stop_event.set()
+
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def _send_group(self, members, message, msg_type):
+        """发送一组内容相同的消息，按接口返回的无效用户拆分为逐行结果；意外出错时组内各行均按失败回报"""
+        try:
+            return self._send_members(members, message, msg_type)
+        except Exception as e:
+            logging.exception(f"发送第{members[0][0]}行所在分组时出错")
+            detail = f"发送出错：{e}"
+            results = []
+            for row_index, user, _ in members:
+                self._write_dead_letter(row_index, user, msg_type, message, detail)
+                results.append((row_index, user, False, detail, False))
+            return results
+
+    def _send_members(self, members, message, msg_type):
+        # 分组时已按应用区分，组内各行分属同一应用
+        account = route(self.accounts, members[0][1])
+        recent = set()
+        message_digest = None
+        if self.dedup is not None:
+            try:
+                message_digest = message_hash(message, msg_type)
+                all_users = {u for _, user, _ in members for u in split_users(user)}
+                recent = self.dedup.recent_users(all_users, message_digest)
+            except Exception as e:
+                # 去重索引不可用时仍然发送，本组仅失去重复抑制
+                logging.warning(f"查询去重索引失败，本组不去重直接发送：{e}")
+                recent, message_digest = set(), None
+        # 去除时间窗口内已收到相同内容的用户，全部重复的行不再调用接口
+        targets = [[u for u in split_users(user) if u not in recent] for _, user, _ in members]
+        to_users = '|'.join(u for users in targets for u in users)
+        if to_users:
+            ok, detail, msgid, invalid_users = self._deliver(account, message, msg_type, to_users)
+        else:
+            ok, detail, msgid, invalid_users = True, None, None, set()
+        results = []
+        for (row_index, user, digest), users in zip(members, targets):
+            skipped = not users
+            row_ok, row_detail = ok, DUPLICATE_DETAIL if skipped else detail
+            if not skipped and ok and invalid_users.intersection(users):
+                row_ok, row_detail = False, f"无效的接收用户：{user}"
+            if self.journal is not None:
+                try:
+                    self.journal.record(row_index, user, digest, row_ok, msgid, None if row_ok else row_detail)
+                except Exception as e:
+                    # 日志写入失败只影响断点续发，该行结果照常回报
+                    logging.error(f"第{row_index}行写入群发日志失败：{e}")
+            if row_ok and not skipped and message_digest is not None:
+                try:
+                    self.dedup.mark(users, message_digest)
+                except Exception as e:
+                    logging.warning(f"第{row_index}行写入去重索引失败：{e}")
+            if not skipped:
+                account.record(row_ok)
+            if not row_ok:
+                logging.error(f"第{row_index}行发送至{user}失败：{row_detail}")
+                self._write_dead_letter(row_index, user, msg_type, message, row_detail)
+            results.append((row_index, user, row_ok, row_detail, skipped))
+        return results
+
+    def _write_dead_letter(self, row_index, to_users, msg_type, message, detail):
+        """写入死信文件，写入失败只记录日志，不影响该行结果的回报"""
+        if self.dead_letter is None:
+            return
+        try:
+            self.dead_letter.write(row_index, to_users, msg_type, message, detail)
+        except Exception as e:
+            logging.error(f"第{row_index}行写入死信文件失败：{e}")
+
+    def _deliver(self, account, message, msg_type, to_users):
+        """通过account发送单条消息，按限速与重试策略处理失败，返回 (是否成功, 结果说明, msgid, 无效用户集合)"""
+        sender, rate_limiter, media = account.sender, account.rate_limiter, account.media
+        policy = self.retry_policy
+        retries = 0 # 临时性失败的重试次数
+        requeues = 0 # 因限流重新排队的次数
+        token_refreshed = False
+        media_refreshed = False
+        options = {}
+        if self.dedup is not None:
+            options['duplicate_check_interval'] = self.dedup.duplicate_check_interval
+        while True:
+            if rate_limiter is not None:
+                with metrics.timer('rate_limit_wait'):
+                    rate_limiter.acquire()
+            try:
+                content = message
+                if msg_type == MSG_TYPE_FILE:
+                    if media is None:
+                        return False, "未启用附件发送", None, set()
+                    with metrics.timer('media_wait'):
+                        content = media.media_id(message)
+                result = sender.send_message(content, msg_type, to_users, **options)
+            except FileNotFoundError as e:
+                return False, f"附件不存在：{e.filename}", None, set()
+            except Exception as e:
+                if policy is not None and retries < policy.max_retries and policy.is_transient_error(e):
+                    metrics.count('retry', type(e).__name__)
+                    time.sleep(policy.backoff(retries))
+                    retries += 1
+                    continue
+                return False, str(e), None, set()
+            errcode = result.get('errcode', -1)
+            if rate_limiter is not None:
+                rate_limiter.report(errcode)
+                # 被限流的消息重新排队，等待限速器放行后再次发送
+                if errcode in THROTTLE_ERRCODES and requeues < THROTTLE_MAX_REQUEUE:
+                    metrics.count('retry', errcode)
+                    requeues += 1
+                    continue
+            # 临时素材过期或失效时重新上传附件并重试一次
+            if msg_type == MSG_TYPE_FILE and errcode in MEDIA_EXPIRED_ERRCODES and not media_refreshed:
+                try:
+                    # 失效缓存需重新计算文件摘要，附件在群发期间被删除时按该行失败处理
+                    media.invalidate(message)
+                except FileNotFoundError as e:
+                    return False, f"附件不存在：{e.filename}", None, set()
+                except Exception as e:
+                    return False, str(e), None, set()
+                media_refreshed = True
+                continue
+            if policy is not None:
+                # 令牌过期时立即刷新令牌并重试，不计入退避次数
+                if policy.is_token_expired(errcode) and not token_refreshed:
+                    sender.invalidate_access_token()
+                    token_refreshed = True
+                    continue
+                if policy.is_transient_errcode(errcode) and retries < policy.max_retries:
+                    metrics.count('retry', errcode)
+                    time.sleep(policy.backoff(retries))
+                    retries += 1
+                    continue
+            invalid_users = set(split_users(result.get('invaliduser', '')))
+            return errcode == 0, result.get('errmsg'), result.get('msgid'), invalid_users
+
+    def _run(self, jobs, total):
+        summary = {'total': total, 'sent': 0, 'failed': 0, 'skipped': 0, 'failures': []}
+        # 信号量限制在途任务数，避免一次性把所有任务压入线程池
+        slots = threading.BoundedSemaphore(self.concurrency * 2)
+        lock = threading.Lock()
+
+        def report(row_index, to_users, ok, detail, skipped=False):
+            with lock:
+                if skipped:
+                    summary['skipped'] += 1
+                elif ok:
+                    summary['sent'] += 1
+                else:
+                    summary['failed'] += 1
+                    summary['failures'].append((row_index, to_users, detail))
+                finished = summary['sent'] + summary['failed'] + summary['skipped']
+            self.progress_queue.put((EVENT_PROGRESS, finished, total, row_index, to_users, ok, detail))
+
+        def on_done(future):
+            # 无论回报是否出错都归还名额，否则在途任务占满后调度线程将一直阻塞
+            try:
+                for row_index, to_users, ok, detail, skipped in future.result():
+                    report(row_index, to_users, ok, detail, skipped)
+            finally:
+                slots.release()
+
+        def pending_jobs():
+            # 取出任务的耗时包含表格读取与模板渲染
+            for row_index, message, msg_type, to_users in metrics.timed_iter('job_source', jobs):
+                if self._stop_event.is_set():
+                    return
+                digest = content_hash(to_users, message)
+                # 断点续发：日志中已成功发送的行直接跳过
+                if self.journal is not None and self.journal.is_delivered(row_index, digest):
+                    report(row_index, to_users, True, SKIPPED_DETAIL, skipped=True)
+                    continue
+                # 附件在后台预先上传，与文本消息的发送并行
+                if msg_type == MSG_TYPE_FILE:
+                    media = route(self.accounts, to_users).media
+                    if media is not None:
+                        media.prefetch(message)
+                yield row_index, message, msg_type, to_users, digest
+
+        summary['error'] = None
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            try:
+                for members, message, msg_type in aggregate(pending_jobs(), self.aggregate_window,
+                                                                  key=lambda job: route(self.accounts, job[3])):
+                    # 停止后不再发出合并窗口中剩余的分组
+                    if self._stop_event.is_set():
+                        break
+                    slots.acquire()
+                    executor.submit(self._send_group, members, message, msg_type).add_done_callback(on_done)
+            except Exception as e:
+                # 任务来源（如表格读取）出错时停止提交，已提交的发送继续完成
+                logging.error(f"读取群发任务失败：{e}")
+                summary['error'] = str(e)
+        metrics.observe('batch', time.perf_counter() - started)
+        summary['stopped'] = self._stop_event.is_set()
+        if self.journal is not None:
+            self.journal.close()
+        if self.dedup is not None:
+            self.dedup.close()
+        for account in self.accounts:
+            if account.media is not None:
+                account.media.close()
+        if len(self.accounts) > 1:
+            summary['accounts'] = {account.name: {'sent': account.sent, 'failed': account.failed} for account in self.accounts}
+        if self.dead_letter is not None:
+            self.dead_letter.close()
+            summary['dead_letter'] = self.dead_letter.path if self.dead_letter.count else None
+        self.progress_queue.put((EVENT_DONE, summary))
@@ -0,0 +1,181 @@
+# 发送链路基准测试
+# 启动本地模拟服务，按表格格式与行数生成合成表格，逐个用例在独立子进程中执行
+# “读取表格 -> 渲染消息 -> 发送”全链路，报告吞吐量、首条消息耗时、内存峰值与各阶段耗时。
+#
+# 用法示例：
+#   python benchmarks/bench_send.py --rows 1000 10000 100000 --formats csv xlsx --latency-ms 20
+#   python benchmarks/bench_send.py --rows 1000000 --dry-run        # 只测读取与渲染
+import argparse # 命令行参数解析支持
+import json # JSON数据处理支持
+import os # 操作系统接口支持
+import subprocess # 子进程支持
+import sys
+import tempfile # 临时文件操作支持
+import time # 时间操作支持
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__)) # 基准测试目录
+ROOT_DIR = os.path.dirname(BENCH_DIR) # 项目根目录
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+from gen_sheets import ensure_sheet, FORMATS, COLUMNS, DEFAULT_SEED # 合成表格生成
+from mock_wecom import start_server, add_mock_arguments, options_from_args # 企业微信接口模拟服务
+
+BENCH_SECTION = 'benchmark' # 模拟服务使用的配置节
+MESSAGE_COLUMNS = COLUMNS[:5] # 参与渲染的列，第一列为接收用户
+
+
+def peak_memory_mb():
+    """本进程的内存峰值（MB），平台不支持时返回None"""
+    try:
+        import resource # 进程资源统计支持
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux下单位为KB，macOS下为字节
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def write_bench_config(path, api_base):
+    import configparser # 配置文件读写支持
+    config = configparser.ConfigParser()
+    config[BENCH_SECTION] = {'agentid': '1000001', 'cropid': 'benchcorp', 'screctid': 'benchsecret',
+                             'api_base': api_base, 'default': 'true'}
+    with open(path, 'w', encoding='utf-8') as f:
+        config.write(f)
+
+
+def run_case(args):
+    """子进程中执行单个用例，结果以一行JSON写入标准输出"""
+    from metrics import metrics # 发送链路指标
+    from message_builder import MessageTemplate # 消息模板
+    from msg_cli import iter_jobs # 命令行群发的任务生成
+    from sheet_reader import open_sheet # 表格读取层
+    metrics.enable()
+    os.chdir(args.workdir)
+    started = time.perf_counter()
+    first_message = None
+    template = MessageTemplate.default(MESSAGE_COLUMNS, True, '###### 基准测试')
+    with open_sheet(args.sheet) as reader:
+        jobs = iter_jobs(reader, MESSAGE_COLUMNS, template)
+        if args.dry_run:
+            count = 0
+            for _ in jobs:
+                if first_message is None:
+                    first_message = time.perf_counter() - started
+                count += 1
+            summary = {'sent': 0, 'failed': 0, 'skipped': 0, 'error': None}
+        else:
+            from batch_sender import BatchSender, EVENT_PROGRESS # 群发调度引擎
+            from config_manager import ConfigManager # 配置管理
+            from dead_letter import DeadLetterWriter # 死信文件
+            from rate_limiter import RateLimiter # 发送限速
+            from retry import RetryPolicy # 发送重试策略
+            from send_journal import SendJournal # 群发日志
+            from wechat_client import WeChat, get_http_session, http_pool_size # 企业微信消息发送
+            write_bench_config('config.ini', args.api_base)
+            sender = WeChat(BENCH_SECTION, session=get_http_session(http_pool_size(args.concurrency)),
+                            config_manager=ConfigManager('config.ini'))
+            limiter = RateLimiter(args.per_minute, args.per_hour) if args.per_minute or args.per_hour else None
+            batch_sender = BatchSender(sender, args.concurrency, limiter, RetryPolicy(args.max_retries, base_delay=0.05),
+                                       DeadLetterWriter('dead_letter.csv'), SendJournal('bench.journal'),
+                                       args.aggregate_window)
+            batch_sender.start(jobs, reader.row_count)
+            count = 0
+            while True:
+                event = batch_sender.progress_queue.get()
+                if event[0] != EVENT_PROGRESS:
+                    summary = event[1]
+                    break
+                if first_message is None:
+                    first_message = time.perf_counter() - started
+                count += 1
+    elapsed = time.perf_counter() - started
+    result = {
+        'rows': count,
+        'elapsed': round(elapsed, 3),
+        'rows_per_second': round(count / elapsed, 1) if elapsed > 0 else None,
+        'first_message_ms': None if first_message is None else round(first_message * 1000, 2),
+        'peak_memory_mb': peak_memory_mb(),
+        'sent': summary['sent'],
+        'failed': summary['failed'],
+        'error': summary['error'],
+        'stages': metrics.snapshot()['stages'],
+    }
+    sys.stdout.write(json.dumps(result, ensure_ascii=False) + '\n')
+
+
+def child_command(args, sheet, api_base, workdir):
+    command = [sys.executable, os.path.abspath(__file__), '--child', '--sheet', sheet, '--api-base', api_base,
+               '--workdir', workdir, '--concurrency', str(args.concurrency), '--per-minute', str(args.per_minute),
+               '--per-hour', str(args.per_hour), '--max-retries', str(args.max_retries),
+               '--aggregate-window', str(args.aggregate_window)]
+    if args.dry_run:
+        command.append('--dry-run')
+    return command
+
+
+def format_row(fmt, result):
+    stages = result.get('stages', {})
+    send = stages.get('send_message', {})
+    return (f"{fmt:<5} {result['rows']:>9} {result['elapsed']:>9.2f}s {result['rows_per_second'] or 0:>10.1f}/s "
+            f"{result['first_message_ms'] or 0:>9.1f}ms {result['peak_memory_mb'] or 0:>8.1f}MB "
+            f"p50 {send.get('p50') or 0:.4f}s p99 {send.get('p99') or 0:.4f}s 失败 {result['failed']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="发送链路基准测试")
+    parser.add_argument('--rows', type=int, nargs='+', default=[1000, 10000, 100000], help="数据行数")
+    parser.add_argument('--formats', nargs='+', choices=FORMATS, default=['csv'], help="表格格式")
+    parser.add_argument('--data-dir', default=os.path.join(BENCH_DIR, 'data'), help="合成表格的存放目录")
+    parser.add_argument('--output', help="将全部结果以JSON写入该文件")
+    parser.add_argument('--concurrency', type=int, default=8, help="群发并发数")
+    parser.add_argument('--per-minute', type=int, default=0, help="每分钟发送预算，0为不限制")
+    parser.add_argument('--per-hour', type=int, default=0, help="每小时发送预算，0为不限制")
+    parser.add_argument('--max-retries', type=int, default=4, help="临时性失败的最大重试次数")
+    parser.add_argument('--aggregate-window', type=int, default=0, help="内容相同行的合并窗口，0为逐行发送")
+    parser.add_argument('--dry-run', action='store_true', help="只读取并渲染，不发送")
+    add_mock_arguments(parser)
+    # 以下参数仅供子进程使用
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--sheet', help=argparse.SUPPRESS)
+    parser.add_argument('--api-base', help=argparse.SUPPRESS)
+    parser.add_argument('--workdir', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    if args.child:
+        run_case(args)
+        return 0
+
+    server = start_server(options_from_args(args))
+    results = []
+    print(f"模拟服务：{server.api_base}", file=sys.stderr)
+    for fmt in args.formats:
+        for rows in args.rows:
+            try:
+                sheet = ensure_sheet(args.data_dir, rows, fmt, DEFAULT_SEED if args.seed is None else args.seed)
+            except (ImportError, ValueError) as e:
+                print(f"跳过 {fmt} {rows}行：{e}", file=sys.stderr)
+                continue
+            before = server.stats.snapshot()
+            # 每个用例使用独立的工作目录与子进程，令牌、日志与内存峰值互不影响
+            with tempfile.TemporaryDirectory() as workdir:
+                completed = subprocess.run(child_command(args, sheet, server.api_base, workdir),
+                                           stdout=subprocess.PIPE, text=True)
+            if completed.returncode != 0 or not completed.stdout.strip():
+                print(f"用例失败：{fmt} {rows}行", file=sys.stderr)
+                continue
+            result = json.loads(completed.stdout.strip().splitlines()[-1])
+            after = server.stats.snapshot()
+            result.update({'format': fmt, 'sheet_rows': rows,
+                           'server': {name: after[name] - before.get(name, 0) for name in after}})
+            results.append(result)
+            print(format_row(fmt, result), flush=True)
+    server.shutdown()
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,91 @@
+# 启动耗时基准测试
+# 在独立子进程中多次导入图形界面与命令行入口模块，报告冷启动耗时（含解释器启动）与导入耗时，
+# 并列出启动时已加载的较重模块，确认它们被推迟到首次使用时加载。
+# “预加载”用例额外导入这些较重模块，模拟推迟加载之前的启动路径作为对照。
+#
+# 用法示例：
+#   python benchmarks/bench_startup.py --repeat 20
+import argparse # 命令行参数解析支持
+import json # JSON数据处理支持
+import os # 操作系统接口支持
+import statistics # 统计计算支持
+import subprocess # 子进程支持
+import sys
+import time # 时间操作支持
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__)) # 基准测试目录
+ROOT_DIR = os.path.dirname(BENCH_DIR) # 项目根目录
+HEAVY_MODULES = ('markdown', 'tkhtmlview', 'requests', 'xlrd', 'openpyxl', 'multiprocessing') # 应推迟加载的较重模块
+CASES = { # 用例名称 -> (导入的入口模块, 是否预加载较重模块)
+    'gui': ('Msg_sender', False),
+    'cli': ('msg_cli', False),
+    'gui-eager': ('Msg_sender', True),
+}
+
+# 子进程中执行的代码，结果以一行JSON写入标准输出
+CHILD_CODE = '''
+import json, sys, time
+started = time.perf_counter()
+import {module}
+if {eager}:
+    for name in {heavy!r}:
+        try:
+            __import__(name)
+        except ImportError:
+            pass
+elapsed = time.perf_counter() - started
+print(json.dumps({{'import_ms': elapsed * 1000, 'loaded': [name for name in {heavy!r} if name in sys.modules]}}))
+'''
+
+
+def run_once(module, eager):
+    code = CHILD_CODE.format(module=module, eager=eager, heavy=HEAVY_MODULES)
+    started = time.perf_counter()
+    completed = subprocess.run([sys.executable, '-c', code], cwd=ROOT_DIR, stdout=subprocess.PIPE, text=True)
+    wall_ms = (time.perf_counter() - started) * 1000
+    if completed.returncode != 0 or not completed.stdout.strip():
+        raise RuntimeError(f"导入{module}失败")
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    result['wall_ms'] = wall_ms
+    return result
+
+
+def run_case(name, repeat):
+    module, eager = CASES[name]
+    # 首次运行用于生成字节码缓存，不计入结果
+    run_once(module, eager)
+    runs = [run_once(module, eager) for _ in range(repeat)]
+    return {
+        'case': name,
+        'wall_ms': round(statistics.median(run['wall_ms'] for run in runs), 2),
+        'import_ms': round(statistics.median(run['import_ms'] for run in runs), 2),
+        'import_min_ms': round(min(run['import_ms'] for run in runs), 2),
+        'loaded': runs[-1]['loaded'],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="启动耗时基准测试")
+    parser.add_argument('--repeat', type=int, default=10, help="每个用例的重复次数")
+    parser.add_argument('--cases', nargs='+', choices=list(CASES), default=list(CASES), help="执行的用例")
+    parser.add_argument('--output', help="将全部结果以JSON写入该文件")
+    args = parser.parse_args(argv)
+    results = []
+    for name in args.cases:
+        try:
+            result = run_case(name, args.repeat)
+        except RuntimeError as e:
+            print(f"用例失败：{name}，{e}", file=sys.stderr)
+            continue
+        results.append(result)
+        loaded = '、'.join(result['loaded']) or '无'
+        print(f"{name:<10} 冷启动 {result['wall_ms']:>8.1f}ms 导入 {result['import_ms']:>8.1f}ms "
+              f"(最快 {result['import_min_ms']:.1f}ms) 已加载较重模块：{loaded}", flush=True)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,107 @@
+# 基准测试数据表格生成
+# 生成固定随机种子的合成数据表格（CSV/xlsx/xls），列与常见的工资条表格一致，同一参数生成的内容相同。
+#
+# 用法示例：
+#   python benchmarks/gen_sheets.py --rows 1000 100000 --formats csv xlsx --output bench_data
+import argparse # 命令行参数解析支持
+import csv # CSV文件读写支持
+import os # 操作系统接口支持
+import random # 随机数生成支持
+
+COLUMNS = ['工号', '姓名', '部门', '应发工资', '实发工资', '备注'] # 合成表格的列
+DEPARTMENTS = ['财务部', '人事部', '信息中心', '销售一部', '销售二部', '生产车间'] # 部门取值
+SURNAMES = '赵钱孙李周吴郑王冯陈褚卫蒋沈韩杨' # 姓氏取值
+GIVEN_NAMES = '伟芳娜敏静丽强磊军洋勇艳杰涛明超' # 名字取值
+XLS_MAX_ROWS = 65535 # xls格式的最大数据行数（不含表头）
+DEFAULT_SEED = 20250101 # 默认随机数种子
+FORMATS = ('csv', 'xlsx', 'xls') # 支持生成的格式
+
+
+def iter_synthetic_rows(rows, seed=DEFAULT_SEED):
+    """逐行生成合成数据"""
+    rng = random.Random(seed)
+    for index in range(rows):
+        salary = rng.randint(3000, 30000)
+        yield [
+            f'E{index:07d}',
+            rng.choice(SURNAMES) + ''.join(rng.choice(GIVEN_NAMES) for _ in range(rng.randint(1, 2))),
+            rng.choice(DEPARTMENTS),
+            salary,
+            round(salary * rng.uniform(0.75, 0.9), 2),
+            '' if rng.random() < 0.8 else '含补发',
+        ]
+
+
+def write_csv(path, rows, seed=DEFAULT_SEED):
+    with open(path, 'w', encoding='utf-8-sig', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(COLUMNS)
+        writer.writerows(iter_synthetic_rows(rows, seed))
+
+
+def write_xlsx(path, rows, seed=DEFAULT_SEED):
+    try:
+        import openpyxl # xlsx文件写入支持
+    except ImportError:
+        raise ImportError("生成xlsx文件需要安装openpyxl：pip install openpyxl")
+    # 只写模式逐行写出，内存占用与行数无关
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(COLUMNS)
+    for row in iter_synthetic_rows(rows, seed):
+        sheet.append(row)
+    workbook.save(path)
+
+
+def write_xls(path, rows, seed=DEFAULT_SEED):
+    if rows > XLS_MAX_ROWS:
+        raise ValueError(f"xls格式最多支持{XLS_MAX_ROWS}行数据")
+    try:
+        import xlwt # xls文件写入支持
+    except ImportError:
+        raise ImportError("生成xls文件需要安装xlwt：pip install xlwt")
+    workbook = xlwt.Workbook(encoding='utf-8')
+    sheet = workbook.add_sheet('Sheet1')
+    for column, name in enumerate(COLUMNS):
+        sheet.write(0, column, name)
+    for row_index, row in enumerate(iter_synthetic_rows(rows, seed), start=1):
+        for column, value in enumerate(row):
+            sheet.write(row_index, column, value)
+    workbook.save(path)
+
+
+_WRITERS = {'csv': write_csv, 'xlsx': write_xlsx, 'xls': write_xls}
+
+
+def sheet_path(directory, rows, fmt, seed=DEFAULT_SEED):
+    return os.path.join(directory, f'bench_{rows}_{seed}.{fmt}')
+
+
+def ensure_sheet(directory, rows, fmt, seed=DEFAULT_SEED):
+    """返回合成表格路径，不存在时生成；已生成的表格直接复用"""
+    path = sheet_path(directory, rows, fmt, seed)
+    if not os.path.exists(path):
+        os.makedirs(directory, exist_ok=True)
+        temp_path = path + '.tmp'
+        _WRITERS[fmt](temp_path, rows, seed)
+        os.replace(temp_path, path)
+    return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="生成基准测试用的合成数据表格")
+    parser.add_argument('--rows', type=int, nargs='+', default=[1000, 10000, 100000, 1000000], help="数据行数")
+    parser.add_argument('--formats', nargs='+', choices=FORMATS, default=['csv'], help="表格格式")
+    parser.add_argument('--output', default='bench_data', help="输出目录")
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED, help="随机数种子")
+    args = parser.parse_args(argv)
+    for fmt in args.formats:
+        for rows in args.rows:
+            try:
+                print(ensure_sheet(args.output, rows, fmt, args.seed))
+            except (ImportError, ValueError) as e:
+                print(f"跳过 {fmt} {rows}行：{e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+# 企业微信接口模拟服务
+# 在本地模拟gettoken、message/send与media/upload接口，可设置响应延迟、错误注入与限流响应，
+# 用于在不访问正式接口的情况下测量发送链路性能。
+#
+# 用法示例：
+#   python benchmarks/mock_wecom.py --port 8900 --latency-ms 50 --throttle-rate 0.01
+#   在config.ini的配置节中设置 api_base = http://127.0.0.1:8900/cgi-bin
+import argparse # 命令行参数解析支持
+import json # JSON数据处理支持
+import random # 随机数生成支持
+import threading # 线程支持
+import time # 时间操作支持
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer # HTTP服务支持
+from urllib.parse import urlparse, parse_qs # URL解析支持
+
+MOCK_TOKEN_LIFETIME = 7200 # 模拟access_token的有效期（秒）
+READ_CHUNK_SIZE = 64 * 1024 # 读取上传内容时每次读取的字节数
+
+
+class MockOptions:
+    """模拟服务行为
+
+    Args:
+        latency_ms: 每次请求的平均延迟（毫秒）
+        jitter_ms: 延迟的随机抖动范围（毫秒）
+        error_rate: 返回系统繁忙(-1)的比例
+        http_error_rate: 返回HTTP 500的比例
+        throttle_rate: 返回接口调用超过限制(45009)的比例
+        token_expire_rate: 返回access_token已过期(42001)的比例
+        invalid_user_rate: 每个接收用户被判定为无效用户的比例
+        seed: 随机数种子，便于复现
+    """
+    def __init__(self, latency_ms=0, jitter_ms=0, error_rate=0, http_error_rate=0, throttle_rate=0,
+                 token_expire_rate=0, invalid_user_rate=0, seed=None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.http_error_rate = http_error_rate
+        self.throttle_rate = throttle_rate
+        self.token_expire_rate = token_expire_rate
+        self.invalid_user_rate = invalid_user_rate
+        self.random = random.Random(seed)
+
+
+class MockStats:
+    """线程安全的请求计数"""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = {}
+
+    def add(self, name):
+        with self._lock:
+            self.counts[name] = self.counts.get(name, 0) + 1
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.counts)
+
+
+class MockWeComHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1' # 支持长连接，与正式接口一致
+
+    def log_message(self, format, *args):
+        pass
+
+    def _delay(self):
+        options = self.server.options
+        if options.latency_ms or options.jitter_ms:
+            with self.server.random_lock:
+                jitter = options.random.uniform(-options.jitter_ms, options.jitter_ms)
+            time.sleep(max(0.0, options.latency_ms + jitter) / 1000)
+
+    def _chance(self, rate):
+        if rate <= 0:
+            return False
+        with self.server.random_lock:
+            return self.server.options.random.random() < rate
+
+    def _reply(self, result, status=200):
+        body = json.dumps(result, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_body(self, keep=True):
+        """读取请求体，上传内容只读取不保留"""
+        remaining = int(self.headers.get('Content-Length') or 0)
+        chunks = []
+        while remaining > 0:
+            chunk = self.rfile.read(min(remaining, READ_CHUNK_SIZE))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            if keep:
+                chunks.append(chunk)
+        return b''.join(chunks)
+
+    def _common_errors(self, name):
+        """按比例注入的通用错误，返回是否已响应"""
+        options = self.server.options
+        stats = self.server.stats
+        if self._chance(options.http_error_rate):
+            stats.add(f'{name}:http500')
+            self._reply({'errcode': -1, 'errmsg': 'internal error'}, status=500)
+            return True
+        if self._chance(options.throttle_rate):
+            stats.add(f'{name}:45009')
+            self._reply({'errcode': 45009, 'errmsg': 'api freq out of limit'})
+            return True
+        if self._chance(options.error_rate):
+            stats.add(f'{name}:-1')
+            self._reply({'errcode': -1, 'errmsg': 'system busy'})
+            return True
+        if self._chance(options.token_expire_rate):
+            stats.add(f'{name}:42001')
+            self._reply({'errcode': 42001, 'errmsg': 'access_token expired'})
+            return True
+        return False
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        self._delay()
+        if url.path.endswith('/gettoken'):
+            query = parse_qs(url.query)
+            self.server.stats.add('gettoken')
+            token = f"mock-{query.get('corpid', [''])[0]}-{int(time.time() * 1000)}"
+            self._reply({'errcode': 0, 'errmsg': 'ok', 'access_token': token, 'expires_in': MOCK_TOKEN_LIFETIME})
+        else:
+            self._reply({'errcode': 404, 'errmsg': 'not found'}, status=404)
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path.endswith('/message/send'):
+            body = self._read_body()
+            self._delay()
+            if self._common_errors('send'):
+                return
+            try:
+                payload = json.loads(body.decode('utf-8'))
+            except ValueError:
+                self._reply({'errcode': 40003, 'errmsg': 'invalid json'})
+                return
+            self.server.stats.add('send')
+            users = [user for user in str(payload.get('touser', '')).split('|') if user]
+            invalid = [user for user in users if self._chance(self.server.options.invalid_user_rate)]
+            result = {'errcode': 0, 'errmsg': 'ok', 'msgid': f'mock-{time.time_ns()}'}
+            if invalid:
+                result['invaliduser'] = '|'.join(invalid)
+            self._reply(result)
+        elif url.path.endswith('/media/upload'):
+            self._read_body(keep=False)
+            self._delay()
+            if self._common_errors('upload'):
+                return
+            self.server.stats.add('upload')
+            self._reply({'errcode': 0, 'errmsg': 'ok', 'type': 'file', 'media_id': f'mock-media-{time.time_ns()}',
+                         'created_at': str(int(time.time()))})
+        else:
+            self._read_body(keep=False)
+            self._reply({'errcode': 404, 'errmsg': 'not found'}, status=404)
+
+
+def start_server(options=None, host='127.0.0.1', port=0):
+    """在后台线程中启动模拟服务，返回服务对象，接口地址为server.api_base"""
+    server = ThreadingHTTPServer((host, port), MockWeComHandler)
+    server.daemon_threads = True
+    server.options = options or MockOptions()
+    server.stats = MockStats()
+    server.random_lock = threading.Lock()
+    server.api_base = f'http://{host}:{server.server_address[1]}/cgi-bin'
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+def add_mock_arguments(parser):
+    """添加模拟服务行为相关的命令行参数"""
+    parser.add_argument('--latency-ms', type=float, default=0, help="每次请求的平均延迟（毫秒）")
+    parser.add_argument('--jitter-ms', type=float, default=0, help="延迟的随机抖动范围（毫秒）")
+    parser.add_argument('--error-rate', type=float, default=0, help="返回系统繁忙(-1)的比例")
+    parser.add_argument('--http-error-rate', type=float, default=0, help="返回HTTP 500的比例")
+    parser.add_argument('--throttle-rate', type=float, default=0, help="返回限流(45009)的比例")
+    parser.add_argument('--token-expire-rate', type=float, default=0, help="返回令牌过期(42001)的比例")
+    parser.add_argument('--invalid-user-rate', type=float, default=0, help="接收用户被判定为无效用户的比例")
+    parser.add_argument('--seed', type=int, help="随机数种子")
+
+
+def options_from_args(args):
+    return MockOptions(args.latency_ms, args.jitter_ms, args.error_rate, args.http_error_rate, args.throttle_rate,
+                       args.token_expire_rate, args.invalid_user_rate, args.seed)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="企业微信接口模拟服务")
+    parser.add_argument('--host', default='127.0.0.1', help="监听地址")
+    parser.add_argument('--port', type=int, default=8900, help="监听端口")
+    add_mock_arguments(parser)
+    args = parser.parse_args(argv)
+    server = start_server(options_from_args(args), args.host, args.port)
+    print(f"模拟服务已启动：{server.api_base}", flush=True)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+        print(json.dumps(server.stats.snapshot(), ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
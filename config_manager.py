@@ -0,0 +1,160 @@
+# 配置管理
+# 读写config.ini中的应用配置节，不依赖图形界面。
+# 配置只解析一次并按配置节建立索引，文件的修改时间或内容摘要变化时才重新解析，写入为原子替换。
+import configparser # 配置文件读写支持
+import hashlib # 摘要算法支持
+import os # 操作系统接口支持
+import random # 随机数生成支持
+import tempfile # 临时文件操作支持
+import threading # 线程支持
+import logging
+
+CONFIG_FILE = 'config.ini' # 配置文件路径
+
+# 配置管理类
+class ConfigManager:
+    """配置管理类
+
+    Args:
+        config_file: 配置文件路径
+        on_error: 出错时的回调函数，参数为错误信息；为None时仅记录日志
+    """
+    def __init__(self, config_file, on_error=None):
+        self.config_file = config_file
+        self.on_error = on_error
+        self.config = configparser.ConfigParser()
+        self.default_section = "default"
+        self.required_fields = ["agentid", "cropid", "screctid"]
+        self._lock = threading.RLock()
+        self._stamp = None # 上次解析时文件的 (修改时间, 大小)
+        self._digest = None # 上次解析时文件内容的摘要
+        self._sections = [] # 排序后的配置节名称
+        self._default_sections = [] # 标记为默认的配置节名称
+        self.created = False # 配置文件不存在、已由本对象创建默认配置
+        self.load_config()
+
+    def load_config(self, force=False):
+        """加载配置文件，如果不存在则创建默认配置；文件未变化时不重新解析
+
+        Args:
+            force: 为True时忽略修改检测，总是重新解析
+
+        Returns:
+            配置是否已重新解析
+        """
+        with self._lock:
+            try:
+                if not os.path.exists(self.config_file):
+                    self._create_default_config()
+                    return True
+                stat = os.stat(self.config_file)
+                stamp = (stat.st_mtime_ns, stat.st_size)
+                if not force and stamp == self._stamp:
+                    return False
+                with open(self.config_file, 'rb') as f:
+                    data = f.read()
+                self._stamp = stamp
+                # 仅修改时间变化而内容未变时（如被重新保存）不必重新解析
+                digest = hashlib.sha1(data).hexdigest()
+                if not force and digest == self._digest:
+                    return False
+                config = configparser.ConfigParser()
+                config.read_string(data.decode('utf-8-sig'), self.config_file)
+                self.config = config
+                self._digest = digest
+                self._reindex()
+                return True
+            except Exception as e:
+                self._report_error(f"加载配置文件失败：{str(e)}")
+                return False
+
+    def _create_default_config(self):
+        """创建默认配置文件"""
+        default_section = f'自动配置项{random.randint(1000, 9999)}'
+        self.config[default_section] = {
+            'agentid': '',
+            'cropid': '',
+            'screctid': '',
+            self.default_section: 'true'
+        }
+        self.save_config()
+        self.created = os.path.exists(self.config_file)
+
+    def save_config(self):
+        """原子写入配置文件，并更新内存中的索引"""
+        with self._lock:
+            directory = os.path.dirname(os.path.abspath(self.config_file))
+            temp_name = None
+            try:
+                with tempfile.NamedTemporaryFile('w', encoding='utf-8', dir=directory, delete=False) as f:
+                    temp_name = f.name
+                    self.config.write(f)
+                    f.flush()
+                    os.fsync(f.fileno())
+                # 重命名新文件，相当于剪切+粘贴，覆盖原来的配置文件
+                os.replace(temp_name, self.config_file)
+                with open(self.config_file, 'rb') as f:
+                    self._digest = hashlib.sha1(f.read()).hexdigest()
+                stat = os.stat(self.config_file)
+                self._stamp = (stat.st_mtime_ns, stat.st_size)
+            except Exception as e:
+                self._report_error(f"保存配置文件失败：{str(e)}")
+                if temp_name and os.path.exists(temp_name):
+                    os.remove(temp_name)
+            # 调用方直接修改self.config后保存，以内存中的配置为准重建索引
+            self._reindex()
+
+    def _reindex(self):
+        sections = sorted(self.config.sections())
+        self._sections = sections
+        self._default_sections = [section for section in sections
+                                  if self.config.getboolean(section, self.default_section, fallback=False)]
+
+    def sections(self):
+        """排序后的配置节名称"""
+        return list(self._sections)
+
+    def default_sections(self):
+        """标记为默认的配置节名称，正常情况下只有一个"""
+        return list(self._default_sections)
+
+    def is_default(self, section):
+        return section in self._default_sections
+
+    def get_default_section(self):
+        """获取默认配置节"""
+        return self._default_sections[0] if self._default_sections else None
+
+    def validate_config(self, section):
+        """验证配置项是否完整"""
+        if not self.config.has_section(section):
+            return False
+        return all(self.config.has_option(section, field) for field in self.required_fields)
+
+    def _report_error(self, message):
+        logging.error(message)
+        if self.on_error is not None:
+            self.on_error(message)
+
+
+_managers = {} # 配置文件绝对路径 -> 共用的配置管理对象
+_managers_lock = threading.Lock()
+
+
+def get_config_manager(config_file=CONFIG_FILE, on_error=None):
+    """获取配置文件对应的共用配置管理对象，同一文件在进程内只解析一次，文件变化时自动重新加载
+
+    Args:
+        config_file: 配置文件路径
+        on_error: 出错时的回调函数，指定时替换已有的回调
+    """
+    key = os.path.abspath(config_file)
+    with _managers_lock:
+        manager = _managers.get(key)
+        if manager is None:
+            manager = _managers[key] = ConfigManager(config_file, on_error)
+            return manager
+    if on_error is not None:
+        manager.on_error = on_error
+    manager.load_config()
+    return manager
@@ -0,0 +1,49 @@
+# 死信文件
+# 记录最终发送失败的消息（已渲染的消息文本），可作为新一轮发送的输入重新投递。
+import csv # CSV文件读写支持
+import threading # 线程支持
+
+DEAD_LETTER_FIELDS = ['行号', '接收用户', '消息类型', '消息', '错误信息'] # 死信文件表头
+
+
+class DeadLetterWriter:
+    """线程安全的死信文件写入类，首次写入时才创建文件
+
+    Args:
+        path: 死信文件路径
+    """
+    def __init__(self, path):
+        self.path = path
+        self.count = 0
+        self._file = None
+        self._writer = None
+        self._lock = threading.Lock()
+
+    def write(self, row_index, to_users, msg_type, message, error):
+        with self._lock:
+            if self._writer is None:
+                # utf-8-sig便于用Excel直接打开查看
+                self._file = open(self.path, 'w', encoding='utf-8-sig', newline='')
+                self._writer = csv.writer(self._file)
+                self._writer.writerow(DEAD_LETTER_FIELDS)
+            self._writer.writerow([row_index, to_users, msg_type, message, error])
+            self._file.flush()
+            self.count += 1
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+                self._writer = None
+
+
+def iter_dead_letters(path):
+    """读取死信文件，逐条生成 (row_index, message, msg_type, to_users) 发送任务"""
+    with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+        reader = csv.DictReader(f)
+        missing = [name for name in DEAD_LETTER_FIELDS[:4] if name not in (reader.fieldnames or [])]
+        if missing:
+            raise ValueError(f"不是有效的死信文件，缺少列：{'、'.join(missing)}")
+        for record in reader:
+            yield int(record['行号']), record['消息'], record['消息类型'], record['接收用户']
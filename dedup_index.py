@@ -0,0 +1,81 @@
+# 重复消息抑制
+# 以SQLite索引记录 (接收用户, 消息摘要) 的最近发送时间，时间窗口内已发送过的消息在调用接口前跳过，
+# 使失败后的重跑与重试不会重复打扰已收到消息的用户。主键查找走B树索引，百万级记录下仍为常数级开销。
+import hashlib # 哈希摘要支持
+import sqlite3 # SQLite数据库支持
+import threading # 线程支持
+import time # 时间操作支持
+from media_cache import MSG_TYPE_FILE, file_digest # 附件内容摘要
+
+DEDUP_FILE = 'sent_index.db' # 去重索引文件路径
+DEFAULT_DEDUP_WINDOW = 4 * 3600 # 默认去重时间窗口（秒）
+MAX_DUPLICATE_CHECK_INTERVAL = 4 * 3600 # 企业微信重复消息检查的最大时间间隔（秒）
+COMMIT_EVERY = 500 # 每写入该条数提交一次事务
+COMMIT_INTERVAL = 1.0 # 距上次提交超过该秒数时提交一次事务
+
+
+def message_hash(message, msg_type='text'):
+    """消息内容摘要，与接收用户无关；附件消息的message为路径，同时计入文件内容摘要，同一路径换了文件不视为重复"""
+    if msg_type == MSG_TYPE_FILE:
+        message = f'{message}\0{file_digest(message)}'
+    return hashlib.sha1(f'{msg_type}\0{message}'.encode('utf-8')).hexdigest()[:16]
+
+
+class DedupIndex:
+    """线程安全的发送去重索引
+
+    Args:
+        path: 索引数据库文件路径
+        window: 去重时间窗口（秒），窗口内向同一用户发送相同内容视为重复
+    """
+    def __init__(self, path=DEDUP_FILE, window=DEFAULT_DEDUP_WINDOW):
+        self.path = path
+        self.window = window
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._committed_at = time.monotonic()
+        # 连接由发送线程共享，访问统一经由self._lock串行化
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute('CREATE TABLE IF NOT EXISTS sent (touser TEXT NOT NULL, hash TEXT NOT NULL, '
+                           'sent_at REAL NOT NULL, PRIMARY KEY (touser, hash)) WITHOUT ROWID')
+        self._prune()
+
+    @property
+    def duplicate_check_interval(self):
+        """对应的企业微信服务端重复消息检查间隔"""
+        return max(1, min(int(self.window), MAX_DUPLICATE_CHECK_INTERVAL))
+
+    def _prune(self):
+        """清理超出时间窗口的记录，避免索引无限增长"""
+        with self._lock:
+            self._conn.execute('DELETE FROM sent WHERE sent_at < ?', (time.time() - self.window,))
+            self._conn.commit()
+
+    def recent_users(self, users, digest):
+        """返回users中时间窗口内已收到该内容的用户集合"""
+        since = time.time() - self.window
+        with self._lock:
+            return {user for user in users
+                    if self._conn.execute('SELECT 1 FROM sent WHERE touser = ? AND hash = ? AND sent_at >= ?',
+                                          (user, digest, since)).fetchone()}
+
+    def mark(self, users, digest):
+        """记录向users发送了该内容"""
+        now = time.time()
+        with self._lock:
+            self._conn.executemany('INSERT OR REPLACE INTO sent (touser, hash, sent_at) VALUES (?, ?, ?)',
+                                   [(user, digest, now) for user in users])
+            self._pending += len(users)
+            if self._pending >= COMMIT_EVERY or time.monotonic() - self._committed_at >= COMMIT_INTERVAL:
+                self._conn.commit()
+                self._pending = 0
+                self._committed_at = time.monotonic()
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.commit()
+                self._conn.close()
+                self._conn = None
@@ -0,0 +1,198 @@
+# 临时素材缓存
+# 附件按文件内容摘要缓存企业微信临时素材media_id（有效期3天），同一文件只上传一次；
+# 上传在独立的线程池中进行，与文本消息的发送并行。
+import hashlib # 哈希摘要支持
+import os # 操作系统接口支持
+import tempfile # 临时文件操作支持
+import threading # 线程支持
+import time # 时间操作支持
+import logging
+from concurrent.futures import ThreadPoolExecutor # 线程池支持
+
+MEDIA_CACHE_FILE = 'media_cache.conf' # 临时素材缓存文件路径
+MEDIA_LIFETIME = 3 * 86400 # 临时素材有效期（秒）
+MEDIA_REFRESH_MARGIN = 3600 # 距过期不足该秒数时重新上传
+UPLOAD_CONCURRENCY = 2 # 同时上传的附件数
+HASH_CHUNK_SIZE = 1024 * 1024 # 计算文件摘要时每次读取的字节数
+MEDIA_EXPIRED_ERRCODES = (40007,) # 不合法的媒体文件id
+MSG_TYPE_FILE = 'file' # 附件消息类型，发送任务中message为附件路径
+
+_digest_cache = {} # (路径, 大小, 修改时间) -> 内容摘要
+_digest_lock = threading.Lock()
+
+
+def file_digest(path):
+    """分块计算文件内容的sha256摘要，文件未变化时复用上次结果"""
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    with _digest_lock:
+        digest = _digest_cache.get(key)
+    if digest is None:
+        sha = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+                sha.update(chunk)
+        digest = sha.hexdigest()
+        with _digest_lock:
+            _digest_cache[key] = digest
+    return digest
+
+
+def resolve_attachment(value, base_dir=''):
+    """将表格中的附件单元格解析为文件路径，相对路径以数据表格所在目录为准；空单元格返回None"""
+    value = str(value).strip()
+    if not value:
+        return None
+    return os.path.normpath(os.path.join(base_dir, os.path.expanduser(value)))
+
+
+class MediaCache:
+    """线程安全的临时素材缓存，按键单飞上传
+
+    Args:
+        path: 后备存储文件路径，每行保存 键\\t上传时间\\tmedia_id
+        lifetime: 临时素材有效期
+        refresh_margin: 距过期不足该秒数时视为未命中
+    """
+    def __init__(self, path=MEDIA_CACHE_FILE, lifetime=MEDIA_LIFETIME, refresh_margin=MEDIA_REFRESH_MARGIN):
+        self.path = path
+        self.lifetime = lifetime
+        self.refresh_margin = refresh_margin
+        self._media = {} # 键 -> (media_id, 上传时间)
+        self._locks = {} # 键 -> 上传锁
+        self._guard = threading.Lock()
+        self._loaded = False
+
+    def get(self, key, upload):
+        """获取media_id，未命中时调用upload()上传
+
+        Args:
+            key: 缓存键，如 (企业ID, 应用ID, 文件摘要)
+            upload: 无参函数，返回 (media_id, 上传时间)
+        """
+        key = self._format_key(key)
+        self._load_once()
+        lock = self._lock_for(key)
+        with lock:
+            # 同一文件并发请求时，只有第一个线程上传，其余线程等待后直接命中
+            entry = self._media.get(key)
+            if entry and time.time() < entry[1] + self.lifetime - self.refresh_margin:
+                return entry[0]
+            media_id, created_at = upload()
+            with self._guard:
+                self._media[key] = (media_id, float(created_at or time.time()))
+                self._save()
+            return media_id
+
+    def invalidate(self, key):
+        """使指定键的media_id失效，如服务端提示media_id无效时"""
+        key = self._format_key(key)
+        with self._guard:
+            if self._media.pop(key, None) is not None:
+                self._save()
+
+    @staticmethod
+    def _format_key(key):
+        if isinstance(key, tuple):
+            return ':'.join(str(part) for part in key)
+        return str(key)
+
+    def _lock_for(self, key):
+        with self._guard:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def _load_once(self):
+        if self._loaded:
+            return
+        with self._guard:
+            if self._loaded:
+                return
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    for line in f:
+                        fields = line.rstrip('\n').split('\t')
+                        if len(fields) != 3:
+                            continue
+                        key, created_at, media_id = fields
+                        self._media[key] = (media_id, float(created_at))
+            except FileNotFoundError:
+                pass
+            except (OSError, ValueError) as e:
+                logging.warning(f"读取临时素材缓存失败，附件将重新上传：{e}")
+            self._loaded = True
+
+    def _save(self):
+        """原子写入后备文件，调用方需持有self._guard"""
+        directory = os.path.dirname(os.path.abspath(self.path))
+        now = time.time()
+        temp_name = None
+        try:
+            with tempfile.NamedTemporaryFile('w', encoding='utf-8', dir=directory, delete=False) as f:
+                temp_name = f.name
+                for key, (media_id, created_at) in self._media.items():
+                    # 已过期的素材不再写回
+                    if created_at + self.lifetime > now:
+                        f.write(f"{key}\t{created_at}\t{media_id}\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_name, self.path)
+        except OSError as e:
+            logging.warning(f"保存临时素材缓存失败：{e}")
+            if temp_name and os.path.exists(temp_name):
+                os.remove(temp_name)
+
+
+# 全局临时素材缓存，缓存文件作为后备存储
+media_cache = MediaCache(MEDIA_CACHE_FILE)
+
+
+class MediaUploader:
+    """附件上传调度类，预先在后台上传附件，发送时等待对应的media_id
+
+    Args:
+        sender: 具有 upload_media(path) 方法及 token_key 属性的发送对象
+        cache: 临时素材缓存，为None时使用全局缓存
+        concurrency: 同时上传的附件数
+    """
+    def __init__(self, sender, cache=None, concurrency=UPLOAD_CONCURRENCY):
+        self.sender = sender
+        self.cache = cache or media_cache
+        self._executor = ThreadPoolExecutor(max_workers=max(1, int(concurrency)))
+        self._futures = {} # 附件路径 -> 上传任务
+        self._lock = threading.Lock()
+
+    def _key(self, path):
+        # media_id仅在上传它的应用内有效
+        return tuple(getattr(self.sender, 'token_key', ())) + (file_digest(path),)
+
+    def _upload(self, path):
+        return self.cache.get(self._key(path), lambda: self.sender.upload_media(path))
+
+    def prefetch(self, path):
+        """提交附件的后台上传，重复提交同一路径时复用已有任务"""
+        with self._lock:
+            future = self._futures.get(path)
+            if future is None:
+                future = self._futures[path] = self._executor.submit(self._upload, path)
+            return future
+
+    def media_id(self, path):
+        """等待并返回附件的media_id，上传失败时抛出原异常"""
+        future = self.prefetch(path)
+        try:
+            return future.result()
+        except Exception:
+            # 丢弃失败的上传任务，重试时重新上传
+            with self._lock:
+                if self._futures.get(path) is future:
+                    del self._futures[path]
+            raise
+
+    def invalidate(self, path):
+        """丢弃附件的media_id，下次获取时重新上传"""
+        with self._lock:
+            self._futures.pop(path, None)
+        self.cache.invalidate(self._key(path))
+
+    def close(self):
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,94 @@
+# 消息格式化
+# 以列名为占位符的消息模板，界面预览与命令行群发共用，不依赖图形界面。
+# 模板每批编译一次，逐行渲染只做一次格式化，不产生中间字符串。
+import re # 正则表达式支持
+
+COPYRIGHT_INFO='\nSending by API消息发送助手\nCopyright © 2023-2025 Kwangwah Hung\nThis software is open source and free to use under the MIT License.\nPermission is hereby granted, free of charge, to any person obtaining a copy of this software.' # 版权信息
+RECIPIENT_NOTE = ' ---(接收用户，此行不作为发送信息)---' # 预览中接收用户行的提示
+
+# 模板记号：{{ 与 }} 表示字面花括号，{列名} 表示占位符，{#序号} 按列序号（从0起）取值
+_TOKEN_PATTERN = re.compile(r'\{\{|\}\}|\{([^{}]+)\}')
+
+
+def _escape(text):
+    """将文本转为模板中的字面内容"""
+    return text.replace('{', '{{').replace('}', '}}')
+
+
+def default_template_text(columns, use_markdown=False, title=None):
+    """生成与原有消息格式一致的模板，第一列为接收用户，不出现在消息中
+
+    Args:
+        columns: 所选列名，第一列为接收用户
+        use_markdown: 是否携带markdown格式标记
+        title: 消息标题，为None时不带标题
+    """
+    lines = [_escape(title) if title is not None else '']
+    for index, name in enumerate(columns[1:], start=1):
+        # 列名含花括号时无法作为占位符，改用列序号
+        placeholder = f'{{#{index}}}' if '{' in name or '}' in name else f'{{{name}}}'
+        if use_markdown:
+            # 携带markdown格式标记
+            lines.append(f"> **<font color=\"info\">{_escape(name)}</font>**: {placeholder}  ")
+        else:
+            # 不携带markdown标记
+            lines.append(f"{_escape(name)}: {placeholder}  ")
+    return '\n'.join(lines) + '\n' + _escape(COPYRIGHT_INFO) + '  \n'
+
+
+class MessageTemplate:
+    """消息模板，以 {列名} 或 {#序号} 作为占位符
+
+    Args:
+        text: 模板文本
+        columns: 每行数据对应的列名，第一列为接收用户
+    """
+    def __init__(self, text, columns):
+        self.text = text
+        self.columns = tuple(columns)
+        column_index = {}
+        for index, name in enumerate(self.columns):
+            column_index.setdefault(name, index)
+        # 编译为按位置取值的格式串，渲染时由str.format一次完成
+        parts = []
+        missing = []
+        position = 0
+        for match in _TOKEN_PATTERN.finditer(text):
+            parts.append(_escape(text[position:match.start()]))
+            name = match.group(1)
+            if name is None:
+                parts.append(match.group(0))
+            else:
+                index = self._resolve(name, column_index)
+                if index is None:
+                    missing.append(name)
+                else:
+                    parts.append(f'{{{index}}}')
+            position = match.end()
+        parts.append(_escape(text[position:]))
+        if missing:
+            raise ValueError(f"模板中的列未被选择：{'、'.join(missing)}")
+        self._format = ''.join(parts).format
+
+    def _resolve(self, name, column_index):
+        if name in column_index:
+            return column_index[name]
+        name = name.strip()
+        if name in column_index:
+            return column_index[name]
+        if name.startswith('#') and name[1:].isdigit() and int(name[1:]) < len(self.columns):
+            return int(name[1:])
+        return None
+
+    @classmethod
+    def default(cls, columns, use_markdown=False, title=None):
+        """按原有消息格式创建模板"""
+        return cls(default_template_text(columns, use_markdown, title), columns)
+
+    def render(self, values):
+        """渲染一行数据，返回发送的消息文本"""
+        return self._format(*values)
+
+    def render_preview(self, values):
+        """渲染预览文本，在消息前标出接收用户"""
+        return f"{self.columns[0]}: {values[0]}  \n{RECIPIENT_NOTE}  \n" + self.render(values)
@@ -0,0 +1,217 @@
+# 发送链路指标
+# 记录各阶段耗时直方图（表格读取、模板渲染、令牌获取、接口调用等）、按错误码的计数与发送速率，
+# 可导出为JSON或Prometheus文本格式。未启用时计时与计数均为空操作，开销可忽略。
+import bisect # 有序序列二分查找支持
+import functools # 函数装饰器支持
+import json # JSON数据处理支持
+import threading # 线程支持
+import time # 时间操作支持
+
+# 直方图桶上界（秒），最后一个桶为无穷大
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, float('inf'))
+QUANTILES = (0.5, 0.95, 0.99) # 导出的分位数
+METRIC_PREFIX = 'msg_sender' # Prometheus指标名前缀
+
+
+class _NullTimer:
+    """未启用时使用的空计时器"""
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _Timer:
+    def __init__(self, registry, stage):
+        self.registry = registry
+        self.stage = stage
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.registry.observe(self.stage, time.perf_counter() - self.started)
+        return False
+
+
+class _Histogram:
+    """固定桶直方图，分位数按桶内线性插值估算"""
+    def __init__(self):
+        self.counts = [0] * len(LATENCY_BUCKETS)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS, value)] += 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q):
+        if not self.count:
+            return None
+        rank = q * self.count
+        cumulative = 0
+        lower = 0.0
+        for upper, count in zip(LATENCY_BUCKETS, self.counts):
+            if count and cumulative + count >= rank:
+                # 无穷大桶以观测到的最大值为上界
+                upper = min(upper, self.max)
+                return lower + (upper - lower) * (rank - cumulative) / count
+            cumulative += count
+            lower = upper
+        return self.max
+
+
+class Metrics:
+    """线程安全的指标记录类，默认不启用"""
+    def __init__(self):
+        self.enabled = False
+        self._lock = threading.Lock()
+        self.reset()
+
+    def enable(self, enabled=True):
+        self.enabled = enabled
+
+    def reset(self):
+        with self._lock:
+            self._histograms = {} # 阶段 -> 直方图
+            self._counters = {} # (名称, 标签) -> 计数
+            self._first_sent = None # 首条消息开始发送的时间
+            self._last_sent = None # 最后一条消息发送完成的时间
+
+    def timer(self, stage):
+        """返回计时上下文，退出时记录阶段耗时"""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, stage)
+
+    def timed(self, stage):
+        """记录函数耗时的装饰器"""
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                with _Timer(self, stage):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def timed_iter(self, stage, iterable):
+        """逐项记录取出迭代器下一项的耗时，如表格逐行读取"""
+        if not self.enabled:
+            return iterable
+        return self._timed_iter(stage, iter(iterable))
+
+    def _timed_iter(self, stage, iterator):
+        while True:
+            started = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            self.observe(stage, time.perf_counter() - started)
+            yield item
+
+    def observe(self, stage, seconds):
+        if not self.enabled:
+            return
+        with self._lock:
+            histogram = self._histograms.get(stage)
+            if histogram is None:
+                histogram = self._histograms[stage] = _Histogram()
+            histogram.observe(seconds)
+
+    def count(self, name, label='', amount=1):
+        if not self.enabled:
+            return
+        with self._lock:
+            key = (name, str(label))
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def record_send(self, started, errcode):
+        """记录一次消息发送：接口耗时、按错误码计数及发送速率的时间范围"""
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        self.observe('send_message', now - started)
+        self.count('send_errcode', errcode)
+        with self._lock:
+            if self._first_sent is None or started < self._first_sent:
+                self._first_sent = started
+            self._last_sent = now if self._last_sent is None else max(self._last_sent, now)
+
+    def snapshot(self):
+        """返回当前指标的字典形式"""
+        with self._lock:
+            stages = {}
+            for stage, histogram in sorted(self._histograms.items()):
+                stages[stage] = {
+                    'count': histogram.count,
+                    'sum': round(histogram.total, 6),
+                    'max': round(histogram.max, 6),
+                }
+                for q in QUANTILES:
+                    value = histogram.quantile(q)
+                    stages[stage][f'p{int(q * 100)}'] = None if value is None else round(value, 6)
+            counters = {}
+            for (name, label), value in sorted(self._counters.items()):
+                counters.setdefault(name, {})[label] = value
+            sent = counters.get('send_errcode', {}).get('0', 0)
+            elapsed = (self._last_sent - self._first_sent) if self._first_sent is not None else 0
+            return {
+                'stages': stages,
+                'counters': counters,
+                'messages_sent': sent,
+                'messages_per_second': round(sent / elapsed, 3) if elapsed > 0 else None,
+            }
+
+    def to_json(self):
+        return json.dumps(self.snapshot(), ensure_ascii=False, indent=2)
+
+    def to_prometheus(self):
+        """导出为Prometheus文本格式"""
+        lines = []
+        with self._lock:
+            histograms = sorted((stage, histogram.counts[:], histogram.count, histogram.total)
+                                for stage, histogram in self._histograms.items())
+            counters = sorted(self._counters.items())
+        name = f'{METRIC_PREFIX}_stage_seconds'
+        lines.append(f'# HELP {name} 各阶段耗时')
+        lines.append(f'# TYPE {name} histogram')
+        for stage, counts, count, total in histograms:
+            cumulative = 0
+            for upper, bucket_count in zip(LATENCY_BUCKETS, counts):
+                cumulative += bucket_count
+                le = '+Inf' if upper == float('inf') else repr(upper)
+                lines.append(f'{name}_bucket{{stage="{stage}",le="{le}"}} {cumulative}')
+            lines.append(f'{name}_sum{{stage="{stage}"}} {total}')
+            lines.append(f'{name}_count{{stage="{stage}"}} {count}')
+        counter_names = sorted({counter_name for (counter_name, _), _ in counters})
+        for counter_name in counter_names:
+            full_name = f'{METRIC_PREFIX}_{counter_name}_total'
+            lines.append(f'# TYPE {full_name} counter')
+            for (current, label), value in counters:
+                if current == counter_name:
+                    lines.append(f'{full_name}{{code="{label}"}} {value}')
+        rate = self.snapshot()['messages_per_second']
+        lines.append(f'# TYPE {METRIC_PREFIX}_messages_per_second gauge')
+        lines.append(f'{METRIC_PREFIX}_messages_per_second {rate or 0}')
+        return '\n'.join(lines) + '\n'
+
+    def export(self, path, output_format='json'):
+        """将指标写入文件，output_format为json或prometheus"""
+        text = self.to_prometheus() if output_format == 'prometheus' else self.to_json()
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text)
+
+
+# 全局指标记录对象
+metrics = Metrics()
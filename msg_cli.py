@@ -0,0 +1,225 @@
+# 命令行群发入口
+# 无界面批量发送，适用于定时任务。进度与逐行结果以JSON行输出到标准输出，日志输出到标准错误。
+#
+# 用法示例：
+#   python msg_cli.py 工资表.xlsx --user-column 工号 --columns 姓名 应发工资 实发工资 --title 三月工资 --markdown
+#   python msg_cli.py dead_letter_20250306_090000.csv --resend
+import argparse # 命令行参数解析支持
+import datetime # 日期时间处理支持
+import json # JSON数据处理支持
+import logging
+import os # 操作系统接口支持
+import sys
+import time # 时间操作支持
+
+from batch_sender import BatchSender, EVENT_PROGRESS, DEFAULT_CONCURRENCY # 群发调度引擎
+from config_manager import get_config_manager, CONFIG_FILE # 配置管理
+from rate_limiter import RateLimiter, DEFAULT_PER_MINUTE, DEFAULT_PER_HOUR # 发送限速
+from retry import RetryPolicy, DEFAULT_MAX_RETRIES # 发送重试策略
+from dead_letter import DeadLetterWriter, iter_dead_letters # 死信文件
+from send_journal import SendJournal, JOURNAL_SUFFIX # 群发日志
+from recipient_batcher import DEFAULT_WINDOW # 接收用户合并
+from dedup_index import DedupIndex, DEDUP_FILE, DEFAULT_DEDUP_WINDOW # 重复消息抑制
+from media_cache import MediaUploader # 临时素材缓存
+from multi_account import build_accounts # 多应用分摊群发
+from recipient_directory import RecipientDirectory, check_recipients, DIRECTORY_FILE, DIRECTORY_TTL, ID_USERID, EXTATTR_PREFIX # 接收用户通讯录解析
+from pipeline import staged, JobRenderer # 群发流水线
+from message_builder import MessageTemplate # 消息模板
+from metrics import metrics # 发送链路指标
+from sheet_reader import open_sheet # 表格读取层
+from sheet_cache import ensure_sidecar, SIDECAR_SUFFIX # 表格解析结果缓存
+
+MSG_TYPE = 'markdown' # 与界面群发一致的消息类型
+DEAD_LETTER_FILE = 'dead_letter_{:%Y%m%d_%H%M%S}.csv' # 默认死信文件名，按群发开始时间命名
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="API消息发送助手命令行群发")
+    parser.add_argument('file', help="数据表格文件（.xls/.xlsx/.csv），使用--resend时为死信文件")
+    parser.add_argument('--resend', action='store_true', help="重发死信文件中的失败消息")
+    parser.add_argument('--user-column', help="接收用户所在列名")
+    parser.add_argument('--recipient-type', default=ID_USERID,
+                        help=f"接收用户列的标识类型：userid、mobile、email、alias，或{EXTATTR_PREFIX}自定义字段名（如{EXTATTR_PREFIX}工号）；"
+                             "非userid时发送前通过通讯录解析")
+    parser.add_argument('--directory-db', default=DIRECTORY_FILE, help=f"本地通讯录索引文件路径（默认：{DIRECTORY_FILE}）")
+    parser.add_argument('--directory-ttl', type=int, default=DIRECTORY_TTL, help="通讯录部门成员的有效期（秒），超过后重新同步")
+    parser.add_argument('--skip-unresolved', action='store_true', help="跳过无法解析接收用户的行继续发送，默认不发送")
+    parser.add_argument('--columns', nargs='+', help="作为消息主体的列名，按顺序排列")
+    parser.add_argument('--attachment-columns', nargs='+', default=[], help="附件路径所在列名，相对路径以数据表格所在目录为准")
+    parser.add_argument('--title', help="消息标题，不指定则不带标题")
+    parser.add_argument('--markdown', action='store_true', help="使用Markdown格式标记")
+    template_group = parser.add_mutually_exclusive_group()
+    template_group.add_argument('--template', help="消息模板，以{列名}作为占位符；指定后--title与--markdown不生效")
+    template_group.add_argument('--template-file', help="从UTF-8文本文件读取消息模板")
+    parser.add_argument('--section', nargs='+', help="使用的配置项，不指定则使用默认配置项；指定多个时按接收用户分摊到各应用发送")
+    parser.add_argument('--config', default=CONFIG_FILE, help=f"配置文件路径（默认：{CONFIG_FILE}）")
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY, help="群发并发数")
+    parser.add_argument('--per-minute', type=int, default=DEFAULT_PER_MINUTE, help="每分钟发送预算，0为不限制")
+    parser.add_argument('--per-hour', type=int, default=DEFAULT_PER_HOUR, help="每小时发送预算，0为不限制")
+    parser.add_argument('--max-retries', type=int, default=DEFAULT_MAX_RETRIES, help="临时性失败的最大重试次数")
+    parser.add_argument('--aggregate-window', type=int, default=DEFAULT_WINDOW, help="内容相同行的合并窗口，0为逐行发送")
+    parser.add_argument('--dedup-window', type=int, default=DEFAULT_DEDUP_WINDOW,
+                        help="去重时间窗口（秒），窗口内不向同一用户重复发送相同内容，0为不去重")
+    parser.add_argument('--dedup-db', default=DEDUP_FILE, help=f"去重索引文件路径（默认：{DEDUP_FILE}）")
+    parser.add_argument('--dead-letter', help="死信文件路径（默认按开始时间命名）")
+    parser.add_argument('--journal', help=f"群发日志路径（默认为数据文件名加{JOURNAL_SUFFIX}）")
+    parser.add_argument('--resume', action='store_true', help="断点续发，跳过群发日志中已成功发送的行")
+    parser.add_argument('--metrics', help="运行结束后将各阶段耗时与错误码统计写入该文件")
+    parser.add_argument('--metrics-format', choices=('json', 'prometheus'), default='json', help="指标文件格式（默认：json）")
+    parser.add_argument('--sheet-cache', action='store_true',
+                        help=f"缓存表格解析结果（数据文件名加{SIDECAR_SUFFIX}），同一表格再次发送时直接读取；已有的有效缓存总会被使用")
+    parser.add_argument('--dry-run', action='store_true', help="只格式化消息并输出，不实际发送")
+    args = parser.parse_args(argv)
+    if not args.resend and not (args.user_column and args.columns):
+        parser.error("发送数据表格时必须指定--user-column和--columns")
+    return args
+
+
+def emit(event, **fields):
+    """向标准输出写入一行JSON"""
+    fields['event'] = event
+    sys.stdout.write(json.dumps(fields, ensure_ascii=False) + '\n')
+    sys.stdout.flush()
+
+
+def build_template(columns, args):
+    """按命令行参数编译消息模板，整批只编译一次"""
+    if args.template_file:
+        with open(args.template_file, 'r', encoding='utf-8') as f:
+            return MessageTemplate(f.read(), columns)
+    if args.template:
+        return MessageTemplate(args.template, columns)
+    title = '###### ' + args.title if args.title else None
+    return MessageTemplate.default(columns, args.markdown, title)
+
+
+def iter_jobs(reader, columns, template, attachment_columns=(), base_dir='', recipients=None):
+    # 读取与渲染在流水线线程中进行，与发送并行；附件列读取在消息列之后
+    rows = metrics.timed_iter('sheet_read', reader.iter_rows(tuple(columns) + tuple(attachment_columns)))
+    renderer = JobRenderer(template, MSG_TYPE, len(columns), base_dir, recipients)
+    return staged(enumerate(rows, start=1), renderer)
+
+
+def resolve_recipients(args):
+    """发送前同步通讯录并解析接收用户列，返回 (标识 -> userid, 跳过的行数)；存在无法解析的行且未指定--skip-unresolved时返回None"""
+    from wechat_client import WeChat # 企业微信消息发送
+    sender = WeChat((args.section or [None])[0], config_manager=get_config_manager(args.config))
+    directory = RecipientDirectory(args.directory_db, args.directory_ttl)
+    try:
+        directory.sync(sender)
+        # 单独读取一遍接收用户列，行号与发送时一致
+        with open_sheet(args.file) as reader:
+            rows = enumerate((values[0] for values in reader.iter_rows((args.user_column,))), start=1)
+            recipients, unresolved = check_recipients(rows, directory, args.recipient_type)
+    finally:
+        directory.close()
+    for row_index, value in unresolved:
+        emit('unresolved', row=row_index, touser=value)
+    if unresolved and not args.skip_unresolved:
+        emit('error', detail=f"{len(unresolved)}行接收用户无法解析，未发送；可使用--skip-unresolved跳过这些行")
+        return None
+    return recipients, len(unresolved)
+
+
+def run_dry(jobs):
+    count = 0
+    for row_index, message, _, to_users in jobs:
+        count += 1
+        emit('row', row=row_index, touser=to_users, message=message)
+    emit('summary', total=count, sent=0, failed=0, dry_run=True)
+    return 0
+
+
+def run_send(jobs, total, args):
+    # 仅在实际发送时加载HTTP相关模块
+    from wechat_client import WeChat, get_http_session, http_pool_size # 企业微信消息发送
+    config_manager = get_config_manager(args.config)
+    sections = args.section or [None]
+    accounts = None
+    if len(sections) > 1:
+        accounts = build_accounts(sections, config_manager, args.per_minute, args.per_hour, args.concurrency)
+        for account in accounts:
+            account.sender.get_access_token()
+        sender = accounts[0].sender
+    else:
+        # 共享连接池不小于并发数，否则超出的发送线程会阻塞等待连接
+        sender = WeChat(sections[0], session=get_http_session(http_pool_size(args.concurrency)), config_manager=config_manager)
+        sender.get_access_token()
+    dead_letter = DeadLetterWriter(args.dead_letter or DEAD_LETTER_FILE.format(datetime.datetime.now()))
+    journal = SendJournal(args.journal or args.file + JOURNAL_SUFFIX, args.resume)
+    dedup = DedupIndex(args.dedup_db, args.dedup_window) if args.dedup_window > 0 else None
+    batch_sender = BatchSender(sender, args.concurrency, RateLimiter(args.per_minute, args.per_hour),
+                               RetryPolicy(args.max_retries), dead_letter, journal, args.aggregate_window,
+                               dedup, MediaUploader(sender), accounts)
+    started = time.time()
+    batch_sender.start(jobs, total)
+    while True:
+        event = batch_sender.progress_queue.get()
+        if event[0] == EVENT_PROGRESS:
+            _, finished, total, row_index, to_users, ok, detail = event
+            emit('progress', finished=finished, total=total, row=row_index, touser=to_users, ok=ok, detail=detail)
+        else:
+            summary = event[1]
+            break
+    emit('summary',
+         total=summary['sent'] + summary['failed'] + summary['skipped'],
+         sent=summary['sent'],
+         failed=summary['failed'],
+         skipped=summary['skipped'],
+         failures=[{'row': row, 'touser': to_users, 'detail': detail} for row, to_users, detail in summary['failures']],
+         error=summary['error'],
+         dead_letter=summary['dead_letter'],
+         accounts=summary.get('accounts'),
+         elapsed=round(time.time() - started, 3))
+    return 0 if not summary['failed'] and not summary['error'] else 1
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s', stream=sys.stderr)
+    metrics.enable(bool(args.metrics))
+    try:
+        return run(args)
+    finally:
+        if args.metrics:
+            try:
+                metrics.export(args.metrics, args.metrics_format)
+            except OSError as e:
+                logging.error(f"写入指标文件失败：{e}")
+
+
+def run(args):
+    try:
+        if args.resend:
+            jobs = iter_dead_letters(args.file)
+            if args.dry_run:
+                return run_dry(jobs)
+            return run_send(jobs, None, args)
+        if args.sheet_cache:
+            ensure_sidecar(args.file)
+        with open_sheet(args.file) as reader:
+            columns = (args.user_column,) + tuple(args.columns)
+            # 发送前先校验列名与模板，缺失的列一次性报告
+            reader.column_indexes(columns + tuple(args.attachment_columns))
+            template = build_template(columns, args)
+            recipients, skipped = None, 0
+            if args.recipient_type != ID_USERID:
+                resolved = resolve_recipients(args)
+                if resolved is None:
+                    return 1
+                recipients, skipped = resolved
+            jobs = iter_jobs(reader, columns, template, args.attachment_columns, os.path.dirname(os.path.abspath(args.file)),
+                             recipients)
+            if args.dry_run:
+                return run_dry(jobs)
+            # 带附件时每行的消息数不定，进度总数未知；无法解析接收用户的行不计入
+            total = None if args.attachment_columns or reader.row_count is None else reader.row_count - skipped
+            return run_send(jobs, total, args)
+    except Exception as e:
+        logging.error(str(e))
+        emit('error', detail=str(e))
+        return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
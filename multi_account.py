@@ -0,0 +1,55 @@
+# 多应用分摊群发
+# 企业微信的调用频率按应用计算。将同一批消息按接收用户稳定地分摊到多个已配置的应用（配置节），
+# 每个应用使用各自的访问令牌、连接池与发送预算，结果由群发调度引擎统一汇总。
+import threading # 线程支持
+import zlib # 校验和支持
+from rate_limiter import RateLimiter, DEFAULT_PER_MINUTE, DEFAULT_PER_HOUR # 发送限速
+from media_cache import MediaUploader # 临时素材缓存
+
+
+class Account:
+    """参与分摊的单个应用
+
+    Args:
+        name: 配置节名称
+        sender: 该应用的发送对象
+        rate_limiter: 该应用的发送限速器
+        media: 该应用的附件上传调度对象，临时素材只在上传它的应用内有效
+    """
+    def __init__(self, name, sender, rate_limiter=None, media=None):
+        self.name = name
+        self.sender = sender
+        self.rate_limiter = rate_limiter
+        self.media = media
+        self.sent = 0
+        self.failed = 0
+        self._lock = threading.Lock()
+
+    def record(self, ok):
+        with self._lock:
+            if ok:
+                self.sent += 1
+            else:
+                self.failed += 1
+
+
+def route(accounts, to_users):
+    """按接收用户选择应用，同一接收用户总是分到同一应用，重发与服务端去重保持一致"""
+    return accounts[zlib.crc32(str(to_users).encode('utf-8')) % len(accounts)]
+
+
+def build_accounts(sections, config_manager, per_minute=DEFAULT_PER_MINUTE, per_hour=DEFAULT_PER_HOUR, concurrency=None):
+    """按配置节创建参与分摊的应用，各应用使用独立的HTTP连接池与发送预算
+
+    Args:
+        concurrency: 群发并发数，各应用的连接池按其大小创建；为None时使用默认大小
+    """
+    # 仅在实际发送时加载HTTP相关模块
+    from wechat_client import WeChat, new_http_session, http_pool_size # 企业微信消息发送
+    if len(set(sections)) != len(sections):
+        raise ValueError("分摊群发的配置节不能重复")
+    accounts = []
+    for section in sections:
+        sender = WeChat(section, session=new_http_session(http_pool_size(concurrency)), config_manager=config_manager)
+        accounts.append(Account(section, sender, RateLimiter(per_minute, per_hour), MediaUploader(sender)))
+    return accounts
@@ -0,0 +1,139 @@
+# 群发流水线
+# 表格读取、消息渲染与发送分属不同线程，阶段之间以有界队列连接：
+# 下游处理不过来时上游阻塞等待（背压），内存占用与表格大小无关，读取第N+1000行与发送第N行同时进行。
+import queue # 线程安全队列支持
+import threading # 线程支持
+from metrics import metrics # 发送链路指标
+from media_cache import MSG_TYPE_FILE, resolve_attachment # 临时素材缓存
+from recipient_directory import normalize_identifier # 接收用户通讯录解析
+
+QUEUE_CHUNKS = 16 # 阶段之间的队列可容纳的数据块数
+CHUNK_SIZE = 64 # 每个数据块的条目数，成块传递以减少队列同步开销
+PUT_TIMEOUT = 0.2 # 放入队列的等待间隔（秒），期间检查是否已停止
+
+_END = object() # 阶段结束标记
+
+
+class _Failure:
+    """上游阶段抛出的异常，随数据传递到下游后重新抛出"""
+    def __init__(self, error):
+        self.error = error
+
+
+class JobRenderer:
+    """将 (行号, 值元组) 渲染为发送任务列表
+
+    Args:
+        template: 编译后的消息模板
+        msg_type: 消息类型
+        column_count: 参与渲染的列数，其后的列为附件路径
+        base_dir: 附件相对路径的基准目录
+        recipients: 接收用户标识 -> userid，为None时第一列即为userid；查不到的行已在发送前报告，不生成任务
+    """
+    def __init__(self, template, msg_type, column_count, base_dir='', recipients=None):
+        self.template = template
+        self.msg_type = msg_type
+        self.column_count = column_count
+        self.base_dir = base_dir
+        self.recipients = recipients
+
+    def __call__(self, row):
+        row_index, values = row
+        to_users = values[0]
+        if self.recipients is not None:
+            to_users = self.recipients.get(normalize_identifier(to_users))
+            if to_users is None:
+                return []
+        with metrics.timer('render'):
+            jobs = [(row_index, self.template.render(values), self.msg_type, to_users)]
+        # 每个非空附件单元格生成一条文件消息
+        for value in values[self.column_count:]:
+            path = resolve_attachment(value, self.base_dir)
+            if path:
+                jobs.append((row_index, path, MSG_TYPE_FILE, to_users))
+        return jobs
+
+
+def staged(source, *stages, queue_chunks=QUEUE_CHUNKS, chunk_size=CHUNK_SIZE):
+    """以流水线方式处理source，逐项生成最终结果
+
+    Args:
+        source: 可迭代的数据源，在独立线程中读取
+        stages: 处理函数，每个函数接收一项并返回结果列表，各在独立线程中运行
+        queue_chunks: 阶段之间的队列容量（数据块数）
+        chunk_size: 每个数据块的条目数
+
+    任一阶段抛出的异常在消费端重新抛出；消费端提前结束时各阶段线程随之退出。
+    """
+    stop = threading.Event()
+    queues = [queue.Queue(maxsize=queue_chunks) for _ in range(len(stages) + 1)]
+
+    def put(target, item):
+        # 带超时地放入，消费端已停止时放弃
+        while not stop.is_set():
+            try:
+                target.put(item, timeout=PUT_TIMEOUT)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def read():
+        output = queues[0]
+        try:
+            chunk = []
+            for item in source:
+                chunk.append(item)
+                if len(chunk) >= chunk_size:
+                    if not put(output, chunk):
+                        return
+                    chunk = []
+            if chunk and not put(output, chunk):
+                return
+            put(output, _END)
+        except Exception as e:
+            put(output, _Failure(e))
+
+    def process(func, source_queue, output):
+        while True:
+            chunk = source_queue.get()
+            if chunk is _END or isinstance(chunk, _Failure):
+                put(output, chunk)
+                return
+            try:
+                results = [result for item in chunk for result in func(item)]
+            except Exception as e:
+                put(output, _Failure(e))
+                return
+            if results and not put(output, results):
+                return
+
+    threads = [threading.Thread(target=read, daemon=True)]
+    for index, func in enumerate(stages):
+        threads.append(threading.Thread(target=process, args=(func, queues[index], queues[index + 1]), daemon=True))
+    for thread in threads:
+        thread.start()
+    try:
+        output = queues[-1]
+        while True:
+            chunk = output.get()
+            if chunk is _END:
+                return
+            if isinstance(chunk, _Failure):
+                raise chunk.error
+            yield from chunk
+    finally:
+        stop.set()
+        # 清空队列，唤醒阻塞在get上的阶段线程
+        for current in queues:
+            while True:
+                try:
+                    current.get_nowait()
+                except queue.Empty:
+                    break
+            try:
+                current.put_nowait(_END)
+            except queue.Full:
+                pass
+        for thread in threads:
+            thread.join(timeout=PUT_TIMEOUT * 5)
@@ -0,0 +1,130 @@
+# 预览分页
+# 按页从表格读取对象中取出预览所需的数据行，只缓存最近访问的若干页与渲染后的HTML，
+# 并在后台预取相邻行，首次预览的耗时与表格大小无关。缓存的数据页按列压缩保存，按行访问时返回行视图。
+import threading # 线程支持
+from collections import OrderedDict # 有序字典支持
+from concurrent.futures import ThreadPoolExecutor # 线程池支持
+from itertools import islice # 迭代器切片支持
+from row_store import ColumnStore # 列式数据行存储
+
+PAGE_SIZE = 100 # 每页读取的数据行数
+MAX_CACHED_PAGES = 5 # 缓存的数据页数
+HTML_CACHE_SIZE = 16 # 缓存的渲染结果数
+
+
+class PreviewPager:
+    """线程安全的预览分页读取类
+
+    Args:
+        reader: 已打开的表格读取对象
+        reopen: 无参函数，返回重新打开的表格读取对象；回看已淘汰的页时从头读取
+        columns: 读取的列名
+        page_size: 每页读取的数据行数
+        max_pages: 缓存的数据页数
+        html_cache_size: 缓存的渲染结果数
+    """
+    def __init__(self, reader, reopen, columns, page_size=PAGE_SIZE, max_pages=MAX_CACHED_PAGES,
+                 html_cache_size=HTML_CACHE_SIZE):
+        self.columns = tuple(columns)
+        self.page_size = page_size
+        self.max_pages = max_pages
+        self.html_cache_size = html_cache_size
+        self._reopen = reopen
+        self._reader = reader
+        self._rows = reader.iter_rows(self.columns)
+        self._next_page = 0 # 读取对象下一次读出的页号
+        self._row_count = None # 读到表格末尾后得知的数据行数
+        self._exhausted = False # 当前读取对象是否已读到末尾
+        self._pages = OrderedDict() # 页号 -> 按列保存的数据页
+        self._html = OrderedDict() # (渲染键, 行号) -> HTML
+        self._lock = threading.RLock()
+        self._executor = ThreadPoolExecutor(max_workers=1)
+
+    @property
+    def row_count(self):
+        """数据行数：读取对象可直接得知行数时（如xls及已缓存的表格）取自读取对象，
+        流式读取时读到表格末尾后才可知，此前返回None"""
+        if self._row_count is not None:
+            return self._row_count
+        with self._lock:
+            return self._reader.row_count
+
+    def row(self, index):
+        """返回第index行（从0开始）的行视图，可像值元组一样使用，超出范围时返回None"""
+        if index < 0 or (self._row_count is not None and index >= self._row_count):
+            return None
+        page_no, offset = divmod(index, self.page_size)
+        with self._lock:
+            page = self._pages.get(page_no)
+            if page is None:
+                page = self._load_page(page_no)
+            else:
+                self._pages.move_to_end(page_no)
+        if page is None or offset >= len(page):
+            return None
+        return page.row(offset)
+
+    def _load_page(self, page_no):
+        """顺序读取至指定页，调用方需持有self._lock"""
+        if page_no < self._next_page:
+            # 目标页已被淘汰，流式读取对象无法回退，重新打开后从头读取
+            self._reader.close()
+            self._reader = self._reopen()
+            self._rows = self._reader.iter_rows(self.columns)
+            self._next_page = 0
+            self._exhausted = False
+        while self._next_page <= page_no:
+            if self._exhausted:
+                return None
+            rows = ColumnStore(self.columns, islice(self._rows, self.page_size))
+            if len(rows) < self.page_size:
+                self._exhausted = True
+                self._row_count = self._next_page * self.page_size + len(rows)
+            if not rows:
+                return None
+            # 跳读途中只保留最终会留在缓存中的页
+            if page_no - self._next_page < self.max_pages:
+                self._pages[self._next_page] = rows
+                while len(self._pages) > self.max_pages:
+                    self._pages.popitem(last=False)
+            self._next_page += 1
+        return self._pages.get(page_no)
+
+    def html(self, index, render, key=''):
+        """返回第index行渲染后的HTML，超出范围时返回None
+
+        Args:
+            index: 行号（从0开始）
+            render: 将值元组渲染为HTML的函数
+            key: 渲染键，渲染方式变化（如模板修改）时应随之变化
+        """
+        cache_key = (key, index)
+        with self._lock:
+            html = self._html.get(cache_key)
+            if html is not None:
+                self._html.move_to_end(cache_key)
+                return html
+        values = self.row(index)
+        if values is None:
+            return None
+        # 渲染不持有锁，避免界面线程等待后台渲染
+        html = render(values)
+        with self._lock:
+            self._html[cache_key] = html
+            while len(self._html) > self.html_cache_size:
+                self._html.popitem(last=False)
+        return html
+
+    def prefetch(self, index, render, key=''):
+        """在后台读取并渲染第index行的前后两行"""
+        def work():
+            for neighbour in (index + 1, index - 1):
+                self.html(neighbour, render, key)
+        self._executor.submit(work)
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        with self._lock:
+            self._reader.close()
+            self._pages.clear()
+            self._html.clear()
@@ -0,0 +1,84 @@
+# 发送限速
+# 令牌桶同时约束每分钟与每小时的调用预算；遇到企业微信限流错误码时暂停并降速，
+# 之后随成功发送逐步恢复。预算不足时调用方排队等待，而不是丢弃消息。
+import threading # 线程支持
+import time # 时间操作支持
+
+# 企业微信单个接口的调用上限为每企业1万次/分、15万次/小时，默认预算留出余量
+DEFAULT_PER_MINUTE = 6000 # 默认每分钟发送预算
+DEFAULT_PER_HOUR = 100000 # 默认每小时发送预算
+THROTTLE_ERRCODES = (45009, 45033) # 接口调用超过限制、接口并发调用超过限制
+THROTTLE_COOLDOWN = 60 # 触发限流后的暂停时长（秒）
+MIN_RATE_FACTOR = 0.1 # 降速后的最低速率比例
+RECOVER_STEP = 0.01 # 每次成功发送恢复的速率比例
+
+
+class _Bucket:
+    """单个令牌桶，容量为周期内的预算，按预算/周期的速率补充"""
+    def __init__(self, budget, period, now):
+        self.capacity = float(budget)
+        self.rate = budget / period
+        self.tokens = float(budget)
+        self.updated = now
+
+    def refill(self, now, factor):
+        # 暂停期间updated位于未来，不补充令牌；降速时桶容量同比缩小
+        elapsed = now - self.updated
+        if elapsed > 0:
+            self.tokens = min(self.capacity * factor, self.tokens + elapsed * self.rate * factor)
+            self.updated = now
+
+    def wait_time(self, factor):
+        """距离可取得一个令牌所需的秒数"""
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / (self.rate * factor)
+
+
+class RateLimiter:
+    """线程安全的发送限速器
+
+    Args:
+        per_minute: 每分钟发送预算，为None或0时不限制
+        per_hour: 每小时发送预算，为None或0时不限制
+    """
+    def __init__(self, per_minute=DEFAULT_PER_MINUTE, per_hour=DEFAULT_PER_HOUR, clock=time.monotonic):
+        self._clock = clock
+        now = clock()
+        self._buckets = [_Bucket(budget, period, now) for budget, period in ((per_minute, 60), (per_hour, 3600)) if budget]
+        self._lock = threading.Lock()
+        self._factor = 1.0 # 当前速率比例，限流后降低
+        self._paused_until = 0.0
+
+    def acquire(self):
+        """取得一次发送许可，预算不足时阻塞等待"""
+        while True:
+            with self._lock:
+                now = self._clock()
+                for bucket in self._buckets:
+                    bucket.refill(now, self._factor)
+                wait = max([self._paused_until - now] + [bucket.wait_time(self._factor) for bucket in self._buckets])
+                if wait <= 0:
+                    for bucket in self._buckets:
+                        bucket.tokens -= 1
+                    return
+            time.sleep(min(wait, 1.0))
+
+    def report(self, errcode):
+        """回报一次发送结果，限流错误码触发暂停与降速，成功时逐步恢复"""
+        with self._lock:
+            if errcode in THROTTLE_ERRCODES:
+                now = self._clock()
+                # 多个在途请求同时被限流时只降速一次
+                if now >= self._paused_until:
+                    self._factor = max(MIN_RATE_FACTOR, self._factor / 2)
+                    self._paused_until = now + THROTTLE_COOLDOWN
+                    for bucket in self._buckets:
+                        bucket.tokens = 0.0
+                        bucket.updated = self._paused_until
+            elif errcode == 0 and self._factor < 1.0:
+                self._factor = min(1.0, self._factor + RECOVER_STEP)
+
+    @property
+    def factor(self):
+        return self._factor
@@ -0,0 +1,60 @@
+# 接收用户合并
+# 将渲染后内容相同的行合并为一次多用户发送（touser以|分隔，单次最多1000人），
+# 适用于值班表、通知等广播类表格。合并窗口有行数与等待时长两个上限，内容各不相同的表格只会短暂延迟少量行，
+# 发送在读到第一批数据后即可开始。
+import time # 时间操作支持
+from collections import OrderedDict # 有序字典支持
+
+MAX_TOUSER = 1000 # 企业微信单次发送的接收用户上限
+DEFAULT_WINDOW = 1000 # 默认合并窗口：等待合并的最大行数
+DEFAULT_MAX_DELAY = 0.2 # 分组等待合并的最长时间（秒），超时后随下一个任务发出
+
+
+def split_users(to_users):
+    """拆分以|分隔的接收用户"""
+    return [user for user in str(to_users).split('|') if user]
+
+
+def aggregate(jobs, window=DEFAULT_WINDOW, max_users=MAX_TOUSER, key=None, max_delay=DEFAULT_MAX_DELAY):
+    """合并内容相同的发送任务
+
+    Args:
+        jobs: 可迭代的 (row_index, message, msg_type, to_users, digest) 任务
+        window: 等待合并的最大行数，超出时最早的分组先发出；为0时不合并
+        max_users: 单个分组的接收用户上限
+        key: 以任务为参数返回附加分组键的函数，键不同的任务不会合并（如分属不同应用）
+        max_delay: 分组等待合并的最长时间（秒），超时的分组在取到下一个任务时发出；为None时只按行数限制
+
+    Yields:
+        (members, message, msg_type)，members为 [(row_index, to_users, digest), ...]
+    """
+    if window <= 0:
+        for row_index, message, msg_type, to_users, digest in jobs:
+            yield [(row_index, to_users, digest)], message, msg_type
+        return
+    groups = OrderedDict() # (附加键, 消息类型, 消息) -> [成员列表, 用户数, 创建时间]
+    pending = 0
+    for job in jobs:
+        row_index, message, msg_type, to_users, digest = job
+        group_key = (key(job) if key is not None else None, msg_type, message)
+        user_count = len(split_users(to_users))
+        group = groups.get(group_key)
+        # 加入后超过用户上限时，先发出已有分组
+        if group is not None and group[1] + user_count > max_users:
+            del groups[group_key]
+            pending -= len(group[0])
+            yield group[0], message, msg_type
+            group = None
+        if group is None:
+            group = groups[group_key] = [[], 0, time.monotonic()]
+        group[0].append((row_index, to_users, digest))
+        group[1] += user_count
+        pending += 1
+        # 分组按创建先后排列，最早的分组超出行数或等待时长上限时先发出
+        expired = None if max_delay is None else time.monotonic() - max_delay
+        while groups and (pending > window or (expired is not None and next(iter(groups.values()))[2] <= expired)):
+            (_, old_type, old_message), (members, _, _) = groups.popitem(last=False)
+            pending -= len(members)
+            yield members, old_message, old_type
+    for (_, msg_type, message), (members, _, _) in groups.items():
+        yield members, message, msg_type
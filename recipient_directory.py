@@ -0,0 +1,173 @@
+# 接收用户通讯录解析
+# 表格中的接收用户列可以是手机号、邮箱、别名或自定义字段（如工号）。发送前通过通讯录接口按部门批量同步到本地SQLite索引，
+# 逐行解析为企业微信userid时只查本地索引，不为每个接收用户调用接口；按部门记录同步时间，超过有效期的部门才重新拉取。
+import sqlite3 # SQLite数据库支持
+import threading # 线程支持
+import time # 时间操作支持
+import logging
+from concurrent.futures import ThreadPoolExecutor # 线程池支持
+
+DIRECTORY_FILE = 'directory.db' # 本地通讯录索引文件
+DIRECTORY_TTL = 24 * 3600 # 部门成员的有效期（秒），超过后重新同步该部门
+SYNC_CONCURRENCY = 4 # 同步时并发拉取的部门数
+LOOKUP_BATCH = 500 # 每次查询的标识数，不超过SQLite的参数个数限制
+ID_USERID = 'userid' # 接收用户列即为userid，无需解析
+ID_MOBILE = 'mobile' # 手机号
+ID_EMAIL = 'email' # 邮箱，包括企业邮箱
+ID_ALIAS = 'alias' # 别名
+EXTATTR_PREFIX = 'ext:' # 自定义字段的类型前缀，如'ext:工号'
+ID_TYPES = (ID_USERID, ID_MOBILE, ID_EMAIL, ID_ALIAS) # 内置的标识类型，另可使用EXTATTR_PREFIX加自定义字段名
+
+
+def normalize_identifier(value):
+    """统一单元格中标识的写法：数值型的手机号去掉小数部分，去除首尾空白，邮箱不区分大小写"""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    text = str(value).strip()
+    return text.lower() if '@' in text else text
+
+
+def user_identifiers(user):
+    """从通讯录成员信息中提取 (标识类型, 标识) 对"""
+    for kind, field in ((ID_MOBILE, 'mobile'), (ID_EMAIL, 'email'), (ID_EMAIL, 'biz_mail'), (ID_ALIAS, 'alias')):
+        if user.get(field):
+            yield kind, normalize_identifier(user[field])
+    for attr in (user.get('extattr') or {}).get('attrs', []):
+        # 文本类型的自定义字段，新旧两种返回格式
+        value = (attr.get('text') or {}).get('value') or attr.get('value')
+        if attr.get('name') and value and attr.get('type', 0) == 0:
+            yield EXTATTR_PREFIX + attr['name'], normalize_identifier(value)
+
+
+class RecipientDirectory:
+    """本地通讯录索引
+
+    Args:
+        path: SQLite索引文件路径
+        ttl: 部门成员的有效期（秒）
+    """
+    def __init__(self, path=DIRECTORY_FILE, ttl=DIRECTORY_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute('CREATE TABLE IF NOT EXISTS departments (id INTEGER PRIMARY KEY, synced_at REAL NOT NULL)')
+        self._conn.execute('CREATE TABLE IF NOT EXISTS members ('
+                           'department_id INTEGER NOT NULL, userid TEXT NOT NULL, '
+                           'PRIMARY KEY (department_id, userid)) WITHOUT ROWID')
+        self._conn.execute('CREATE TABLE IF NOT EXISTS identifiers ('
+                           'kind TEXT NOT NULL, value TEXT NOT NULL, userid TEXT NOT NULL, '
+                           'PRIMARY KEY (kind, value)) WITHOUT ROWID')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS identifiers_userid ON identifiers (userid)')
+        self._conn.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value REAL) WITHOUT ROWID')
+        self._conn.commit()
+
+    def sync(self, client, force=False):
+        """同步通讯录：部门列表在有效期内不重新拉取，只重新拉取超过有效期的部门成员
+
+        Args:
+            client: 提供list_departments()与list_department_users(部门ID)的接口对象
+            force: 为True时忽略有效期，全部重新同步
+
+        Returns:
+            本次重新拉取成员的部门数
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'checked_at'").fetchone()
+        if not force and row and now - row[0] < self.ttl:
+            return 0
+        department_ids = [department['id'] for department in client.list_departments()]
+        with self._lock:
+            synced = dict(self._conn.execute('SELECT id, synced_at FROM departments'))
+        stale = [department_id for department_id in department_ids
+                 if force or now - synced.get(department_id, 0) >= self.ttl]
+        # 并发拉取各部门成员，写入在当前线程中逐个部门提交
+        with ThreadPoolExecutor(SYNC_CONCURRENCY) as executor:
+            for department_id, users in zip(stale, executor.map(client.list_department_users, stale)):
+                self._store_department(department_id, users)
+        with self._lock, self._conn:
+            # 已删除的部门及不再属于任何部门的成员一并清除
+            current = set(department_ids)
+            removed = [(department_id,) for department_id in synced if department_id not in current]
+            self._conn.executemany('DELETE FROM members WHERE department_id = ?', removed)
+            self._conn.executemany('DELETE FROM departments WHERE id = ?', removed)
+            self._conn.execute('DELETE FROM identifiers WHERE userid NOT IN (SELECT userid FROM members)')
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('checked_at', ?)", (now,))
+        logging.info(f"通讯录同步完成：共{len(department_ids)}个部门，重新拉取{len(stale)}个")
+        return len(stale)
+
+    def _store_department(self, department_id, users):
+        with self._lock, self._conn:
+            self._conn.execute('DELETE FROM members WHERE department_id = ?', (department_id,))
+            self._conn.executemany('INSERT OR IGNORE INTO members (department_id, userid) VALUES (?, ?)',
+                                   [(department_id, user['userid']) for user in users])
+            for user in users:
+                # 成员信息以最近一次拉取为准，旧的标识先删除
+                self._conn.execute('DELETE FROM identifiers WHERE userid = ?', (user['userid'],))
+                self._conn.executemany('INSERT OR REPLACE INTO identifiers (kind, value, userid) VALUES (?, ?, ?)',
+                                       [(kind, value, user['userid']) for kind, value in user_identifiers(user)])
+            self._conn.execute('INSERT OR REPLACE INTO departments (id, synced_at) VALUES (?, ?)',
+                               (department_id, time.time()))
+
+    def lookup(self, values, kind):
+        """批量查询标识对应的userid，返回 标识 -> userid，查不到的标识不在结果中"""
+        values = list(values)
+        if kind == ID_USERID:
+            return {value: value for value in values}
+        found = {}
+        with self._lock:
+            for start in range(0, len(values), LOOKUP_BATCH):
+                chunk = values[start:start + LOOKUP_BATCH]
+                placeholders = ','.join('?' * len(chunk))
+                found.update(self._conn.execute(
+                    f'SELECT value, userid FROM identifiers WHERE kind = ? AND value IN ({placeholders})',
+                    [kind] + chunk))
+        return found
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def check_recipients(rows, directory, kind):
+    """逐行解析接收用户，发送前找出无法解析的行
+
+    Args:
+        rows: (行号, 接收用户标识) 的可迭代对象
+        directory: 本地通讯录索引
+        kind: 标识类型
+
+    Returns:
+        (标识 -> userid, [(行号, 标识), ...] 无法解析的行)
+    """
+    resolved = {}
+    missing = set()
+    unresolved = []
+    pending = {} # 待查询的标识 -> 出现的行号
+
+    def flush():
+        found = directory.lookup(pending, kind)
+        for value, row_indexes in pending.items():
+            if value in found:
+                resolved[value] = found[value]
+            else:
+                missing.add(value)
+                unresolved.extend((row_index, value) for row_index in row_indexes)
+        pending.clear()
+
+    # 相同标识只查询一次，攒够一批后一起查询
+    for row_index, value in rows:
+        value = normalize_identifier(value)
+        if value in resolved:
+            continue
+        if value in missing:
+            unresolved.append((row_index, value))
+            continue
+        pending.setdefault(value, []).append(row_index)
+        if len(pending) >= LOOKUP_BATCH:
+            flush()
+    flush()
+    unresolved.sort()
+    return resolved, unresolved
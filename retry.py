@@ -0,0 +1,50 @@
+# 发送重试策略
+# 对超时、连接错误、5xx响应及系统繁忙(-1)等临时性失败按带抖动的指数退避重试；
+# 访问令牌过期时立即刷新令牌并重试一次。
+import random # 随机数生成支持
+
+DEFAULT_MAX_RETRIES = 4 # 临时性失败的最大重试次数
+DEFAULT_BASE_DELAY = 0.5 # 退避基准时长（秒）
+DEFAULT_MAX_DELAY = 30 # 单次退避上限（秒）
+TRANSIENT_ERRCODES = (-1,) # 系统繁忙
+TOKEN_EXPIRED_ERRCODES = (40014, 42001) # access_token不合法、已过期
+
+
+class RetryPolicy:
+    """重试策略
+
+    Args:
+        max_retries: 临时性失败的最大重试次数，不含首次发送
+        base_delay: 退避基准时长，第n次重试的退避上限为 base_delay * 2**n
+        max_delay: 单次退避上限
+    """
+    def __init__(self, max_retries=DEFAULT_MAX_RETRIES, base_delay=DEFAULT_BASE_DELAY, max_delay=DEFAULT_MAX_DELAY):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def backoff(self, retry_count):
+        """第retry_count次重试前的等待秒数，采用全抖动避免重试集中"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** retry_count)))
+
+    @staticmethod
+    def is_transient_error(error):
+        """判断异常是否为可重试的临时性失败"""
+        if isinstance(error, ValueError):
+            # 响应体无法解析为JSON（如代理或认证页面返回的HTML）是确定性失败，重试不会改变结果；
+            # requests的JSONDecodeError同时是OSError的子类，需先于连接错误判断
+            return False
+        response = getattr(error, 'response', None)
+        if response is not None:
+            # HTTP错误仅对5xx响应重试
+            return response.status_code >= 500
+        # 超时与连接错误均为OSError的子类
+        return isinstance(error, OSError)
+
+    @staticmethod
+    def is_transient_errcode(errcode):
+        return errcode in TRANSIENT_ERRCODES
+
+    @staticmethod
+    def is_token_expired(errcode):
+        return errcode in TOKEN_EXPIRED_ERRCODES
@@ -0,0 +1,164 @@
+# 列式数据行存储
+# 将一批数据行按列保存：整数列与小数列存为定长数组，重复取值多的文本列存为字典编码，
+# 其余文本列拼接为一段UTF-8字节并记录偏移；按行访问时返回轻量的行视图，不为每行分配字典或元组。
+import sys
+from array import array # 定长数值数组支持
+
+DICTIONARY_RATIO = 0.5 # 不同取值数不超过行数的该比例时使用字典编码
+
+
+class DictColumn:
+    """字典编码的文本列：每行只保存取值编号"""
+    __slots__ = ('values', 'codes')
+
+    def __init__(self, values):
+        codes = {}
+        self.codes = array('I', (codes.setdefault(value, len(codes)) for value in values))
+        self.values = list(codes)
+
+    @classmethod
+    def from_parts(cls, values, codes):
+        """由取值列表与编号序列（可为memoryview）直接构造，不复制编号"""
+        column = cls.__new__(cls)
+        column.values = values
+        column.codes = codes
+        return column
+
+    def __getitem__(self, index):
+        return self.values[self.codes[index]]
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __sizeof__(self):
+        return sys.getsizeof(self.codes) + sys.getsizeof(self.values) + sum(map(sys.getsizeof, self.values))
+
+
+class TextColumn:
+    """拼接保存的文本列：全部取值编码为一段UTF-8字节，按偏移取出"""
+    __slots__ = ('buffer', 'offsets')
+
+    def __init__(self, values):
+        encoded = [value.encode('utf-8') for value in values]
+        offsets = array('Q', [0])
+        total = 0
+        for item in encoded:
+            total += len(item)
+            offsets.append(total)
+        self.buffer = b''.join(encoded)
+        self.offsets = offsets
+
+    @classmethod
+    def from_buffers(cls, buffer, offsets):
+        """由字节缓冲与偏移序列（可为memoryview）直接构造，不复制数据"""
+        column = cls.__new__(cls)
+        column.buffer = buffer
+        column.offsets = offsets
+        return column
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        return str(self.buffer[self.offsets[index]:self.offsets[index + 1]], 'utf-8')
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __sizeof__(self):
+        return sys.getsizeof(self.buffer) + sys.getsizeof(self.offsets)
+
+
+def compact_column(values):
+    """将一列值转换为紧凑的存储形式"""
+    kinds = {type(value) for value in values}
+    if kinds == {float}:
+        return array('d', values)
+    if kinds == {int}:
+        try:
+            return array('q', values)
+        except OverflowError:
+            pass
+    if kinds == {str}:
+        # 部门、状态等重复取值多的列只保存每个取值一次
+        if len(set(values)) <= len(values) * DICTIONARY_RATIO:
+            return DictColumn(values)
+        return TextColumn(values)
+    return values
+
+
+class ColumnStore:
+    """按列保存的一批数据行
+
+    Args:
+        columns: 列名
+        rows: 值元组的可迭代对象，逐行读入后按列压缩
+    """
+    __slots__ = ('columns', '_data', '_length')
+
+    def __init__(self, columns, rows):
+        self.columns = tuple(columns)
+        data = [[] for _ in self.columns]
+        length = 0
+        for row in rows:
+            for column, value in zip(data, row):
+                column.append(value)
+            length += 1
+        self._data = [compact_column(column) for column in data]
+        self._length = length
+
+    def __len__(self):
+        return self._length
+
+    def row(self, index):
+        """返回第index行的行视图，超出范围时抛出IndexError"""
+        if not 0 <= index < self._length:
+            raise IndexError(index)
+        return RowView(self, index)
+
+    def __iter__(self):
+        return (RowView(self, index) for index in range(self._length))
+
+    def column(self, name):
+        """按列名返回整列的值序列"""
+        return self._data[self.columns.index(name)]
+
+    def nbytes(self):
+        """各列占用的字节数，混合类型的列不含其中的值对象"""
+        return sum(sys.getsizeof(column) for column in self._data)
+
+
+class RowView:
+    """数据行视图，可像值元组一样按列号取值、遍历与解包"""
+    __slots__ = ('_store', '_index')
+
+    def __init__(self, store, index):
+        self._store = store
+        self._index = index
+
+    def __getitem__(self, column):
+        if isinstance(column, slice):
+            return tuple(self)[column]
+        return self._store._data[column][self._index]
+
+    def __len__(self):
+        return len(self._store._data)
+
+    def __iter__(self):
+        index = self._index
+        return (column[index] for column in self._store._data)
+
+    def __eq__(self, other):
+        return tuple(self) == tuple(other)
+
+    def __hash__(self):
+        return hash(tuple(self))
+
+    def get(self, name, default=None):
+        """按列名取值"""
+        try:
+            return self[self._store.columns.index(name)]
+        except ValueError:
+            return default
+
+    def __repr__(self):
+        return f'RowView{tuple(self)!r}'
@@ -0,0 +1,86 @@
+# 群发日志
+# 追加写入每行的发送结果（行号、接收用户、内容摘要、msgid、结果），分批fsync落盘。
+# 进程中断后重新群发时，据此跳过已成功发送的行，避免重复发送。
+import hashlib # 哈希摘要支持
+import json # JSON数据处理支持
+import os # 操作系统接口支持
+import threading # 线程支持
+import time # 时间操作支持
+import logging
+
+JOURNAL_SUFFIX = '.journal' # 群发日志文件后缀，与数据表格同名存放
+SYNC_EVERY = 200 # 每写入该条数fsync一次
+SYNC_INTERVAL = 1.0 # 距上次fsync超过该秒数时fsync一次
+
+
+def content_hash(to_users, message):
+    """接收用户与消息内容的摘要，用于判断同一行内容是否已发送"""
+    return hashlib.sha1(f'{to_users}\0{message}'.encode('utf-8')).hexdigest()[:16]
+
+
+class SendJournal:
+    """线程安全的追加式群发日志
+
+    Args:
+        path: 日志文件路径，每行一条JSON记录
+        resume: 为True时保留已有记录用于断点续发，否则清空重新记录
+    """
+    def __init__(self, path, resume=False):
+        self.path = path
+        self.delivered = self._load_delivered() if resume else set()
+        self._file = open(path, 'a' if resume else 'w', encoding='utf-8')
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._synced_at = time.monotonic()
+
+    def _load_delivered(self):
+        """读取已成功发送的 (行号, 内容摘要)"""
+        delivered = set()
+        if not os.path.exists(self.path):
+            return delivered
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # 进程中断时最后一行可能写入不完整
+                    continue
+                if record.get('ok'):
+                    delivered.add((record['row'], record['hash']))
+        return delivered
+
+    def is_delivered(self, row_index, digest):
+        return (row_index, digest) in self.delivered
+
+    def record(self, row_index, to_users, digest, ok, msgid=None, detail=None):
+        line = json.dumps({'row': row_index, 'touser': to_users, 'hash': digest, 'msgid': msgid,
+                           'ok': ok, 'detail': detail, 'time': round(time.time(), 3)}, ensure_ascii=False)
+        with self._lock:
+            self._file.write(line + '\n')
+            self._pending += 1
+            if self._pending >= SYNC_EVERY or time.monotonic() - self._synced_at >= SYNC_INTERVAL:
+                self._sync()
+
+    def _sync(self):
+        """调用方需持有self._lock"""
+        try:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        except OSError as e:
+            logging.warning(f"群发日志落盘失败：{e}")
+        self._pending = 0
+        self._synced_at = time.monotonic()
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._sync()
+                self._file.close()
+
+
+def has_delivered_records(path):
+    """判断日志中是否存在已成功发送的记录"""
+    if not os.path.exists(path):
+        return False
+    with open(path, 'r', encoding='utf-8') as f:
+        return any('"ok": true' in line for line in f)
@@ -0,0 +1,249 @@
+# 表格解析结果缓存
+# 将Excel表格第一个工作表的解析结果按列写入与表格同目录的二进制缓存文件，再次打开时以内存映射方式读取，
+# 数值列与文本列直接引用映射内存而不复制；表格的大小与修改时间变化且内容摘要不同时缓存失效，改为重新解析。
+#
+# 缓存文件结构：文件头 | 按行分组的列数据段（8字节对齐） | JSON目录 | 目录长度(8字节) | 文件尾
+import glob # 文件名模式匹配支持
+import json # JSON数据处理支持
+import mmap # 内存映射支持
+import os # 操作系统接口支持
+import struct # 二进制数据打包支持
+import sys
+import tempfile # 临时文件操作支持
+import time # 时间操作支持
+import logging
+from array import array # 定长数值数组支持
+from itertools import islice # 迭代器切片支持
+from sheet_reader import SheetReader # 表格读取层
+from row_store import ColumnStore, DictColumn, TextColumn # 列式数据行存储
+from media_cache import file_digest # 文件内容摘要
+
+SIDECAR_SUFFIX = '.sheetcache' # 缓存文件后缀，与表格同目录
+CACHED_EXTENSIONS = ('.xls', '.xlsx', '.xlsm') # 解析较慢、值得缓存的表格格式
+GROUP_ROWS = 65536 # 每个行分组的行数，写入时内存占用与表格大小无关
+SIDECAR_VERSION = 1 # 缓存格式版本
+MAGIC = b'WXSHEET\x01' # 文件头与文件尾标记
+_FOOTER = struct.Struct('<Q') # 目录长度
+_ALIGN = 8 # 列数据段的对齐字节数
+STALE_TEMP_AGE = 3600 # 超过该秒数未修改的临时文件视为写入中断（如程序退出）的遗留，生成缓存时清除
+
+
+def sidecar_path(path):
+    return path + SIDECAR_SUFFIX
+
+
+class _JsonColumn:
+    """混合类型的列：每个值保存为一段JSON文本，取值时解码"""
+    __slots__ = ('_text',)
+
+    def __init__(self, text):
+        self._text = text
+
+    def __getitem__(self, index):
+        return json.loads(self._text[index])
+
+    def __len__(self):
+        return len(self._text)
+
+
+class _SidecarWriter:
+    """顺序写入列数据段并记录其位置"""
+    def __init__(self, f):
+        self.f = f
+        self.f.write(MAGIC)
+
+    def segment(self, data):
+        """写入一段数据，返回 [偏移, 长度]"""
+        padding = -self.f.tell() % _ALIGN
+        if padding:
+            self.f.write(b'\0' * padding)
+        offset = self.f.tell()
+        self.f.write(data)
+        return [offset, len(data)]
+
+    def text(self, column):
+        return {'offsets': self.segment(column.offsets.tobytes()), 'buffer': self.segment(column.buffer)}
+
+    def column(self, column):
+        if isinstance(column, array):
+            return {'kind': 'f8' if column.typecode == 'd' else 'i8', 'data': self.segment(column.tobytes())}
+        if isinstance(column, TextColumn):
+            return dict(kind='text', **self.text(column))
+        if isinstance(column, DictColumn):
+            return dict(kind='dict', codes=self.segment(column.codes.tobytes()), **self.text(TextColumn(column.values)))
+        # 混合类型：Excel日期等无法直接保存的值按文本保存
+        encoded = [json.dumps(value, ensure_ascii=False, default=str) for value in column]
+        return dict(kind='json', **self.text(TextColumn(encoded)))
+
+
+def _remove_stale_temps(target):
+    """清除此前写入中断遗留的临时文件，正在写入的临时文件不受影响"""
+    now = time.time()
+    for name in glob.glob(glob.escape(target) + '.*.tmp'):
+        try:
+            if now - os.path.getmtime(name) > STALE_TEMP_AGE:
+                os.remove(name)
+        except OSError:
+            pass
+
+
+def build_sidecar(path, group_rows=GROUP_ROWS):
+    """解析表格并写入缓存文件，先写临时文件再原子替换，写入中断不会留下可用的半成品"""
+    from sheet_reader import open_sheet # 表格读取层
+    stat = os.stat(path)
+    target = sidecar_path(path)
+    _remove_stale_temps(target)
+    temp_name = None
+    try:
+        with open_sheet(path, use_cache=False) as reader:
+            # 列名重复时只保存第一次出现的列，与按列名读取的结果一致
+            columns = list(dict.fromkeys(reader.header))
+            rows = reader.iter_rows(columns)
+            groups = []
+            with tempfile.NamedTemporaryFile('wb', dir=os.path.dirname(os.path.abspath(target)),
+                                             prefix=os.path.basename(target) + '.', suffix='.tmp', delete=False) as f:
+                temp_name = f.name
+                writer = _SidecarWriter(f)
+                while True:
+                    store = ColumnStore(columns, islice(rows, group_rows))
+                    if not len(store):
+                        break
+                    groups.append({'rows': len(store),
+                                   'columns': [writer.column(store.column(name)) for name in columns]})
+                directory = json.dumps({
+                    'version': SIDECAR_VERSION,
+                    'byteorder': sys.byteorder,
+                    'source': {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'digest': file_digest(path)},
+                    'header': reader.header,
+                    'columns': columns,
+                    'rows': sum(group['rows'] for group in groups),
+                    'groups': groups,
+                }, ensure_ascii=False).encode('utf-8')
+                f.write(directory)
+                f.write(_FOOTER.pack(len(directory)))
+                f.write(MAGIC)
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(temp_name, target)
+        return target
+    except Exception:
+        if temp_name and os.path.exists(temp_name):
+            os.remove(temp_name)
+        raise
+
+
+class CachedSheetReader(SheetReader):
+    """以内存映射方式读取缓存文件的表格读取类
+
+    Args:
+        path: 缓存文件路径
+    """
+    def __init__(self, path):
+        self._file = open(path, 'rb')
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self.directory = self._read_directory()
+        except (ValueError, OSError):
+            self.close()
+            raise
+        self.header = self.directory['header']
+        self._build_header_index()
+
+    def _read_directory(self):
+        size = len(self._map)
+        tail = len(MAGIC) + _FOOTER.size
+        if size < len(MAGIC) + tail or self._map[:len(MAGIC)] != MAGIC or self._map[-len(MAGIC):] != MAGIC:
+            raise ValueError("缓存文件不完整")
+        (length,) = _FOOTER.unpack_from(self._map, size - tail)
+        directory = json.loads(self._map[size - tail - length:size - tail].decode('utf-8'))
+        if directory.get('version') != SIDECAR_VERSION or directory.get('byteorder') != sys.byteorder:
+            raise ValueError("缓存文件格式不兼容")
+        return directory
+
+    @property
+    def row_count(self):
+        return self.directory['rows']
+
+    def matches(self, path):
+        """缓存是否对应表格的当前内容：大小与修改时间一致，或内容摘要一致（如文件被复制或仅修改了时间）"""
+        source = self.directory['source']
+        stat = os.stat(path)
+        if stat.st_size != source['size']:
+            return False
+        return stat.st_mtime_ns == source['mtime_ns'] or file_digest(path) == source['digest']
+
+    def _column(self, view, meta):
+        """在映射内存上构造列，不复制数据"""
+        def segment(key, typecode='B'):
+            offset, length = meta[key]
+            data = view[offset:offset + length]
+            return data if typecode == 'B' else data.cast(typecode)
+        kind = meta['kind']
+        if kind == 'f8':
+            return segment('data', 'd')
+        if kind == 'i8':
+            return segment('data', 'q')
+        text = TextColumn.from_buffers(segment('buffer'), segment('offsets', 'Q'))
+        if kind == 'text':
+            return text
+        if kind == 'dict':
+            return DictColumn.from_parts([text[i] for i in range(len(text))], segment('codes', 'I'))
+        return _JsonColumn(text)
+
+    def iter_rows(self, columns):
+        indexes = self.column_indexes(columns)
+        # 读取时按列名解析出的列号对应表头位置，换算为缓存中的列序号
+        stored = {name: position for position, name in enumerate(self.directory['columns'])}
+        positions = [stored[self.header[index]] for index in indexes]
+        view = memoryview(self._map)
+        try:
+            for group in self.directory['groups']:
+                group_columns = [self._column(view, group['columns'][position]) for position in positions]
+                for row_index in range(group['rows']):
+                    yield tuple(column[row_index] for column in group_columns)
+                del group_columns
+        finally:
+            view.release()
+
+    def close(self):
+        mapped = getattr(self, '_map', None)
+        if mapped is not None:
+            try:
+                mapped.close()
+            except BufferError:
+                # 仍有未结束的读取引用映射内存，由垃圾回收释放
+                pass
+            self._map = None
+        self._file.close()
+
+
+def open_cached(path):
+    """打开表格对应的有效缓存，缓存不存在、损坏或已过期时返回None"""
+    if os.path.splitext(path)[1].lower() not in CACHED_EXTENSIONS:
+        return None
+    try:
+        reader = CachedSheetReader(sidecar_path(path))
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logging.warning(f"读取表格缓存失败，将重新解析：{e}")
+        return None
+    try:
+        if reader.matches(path):
+            return reader
+    except OSError:
+        pass
+    reader.close()
+    return None
+
+
+def ensure_sidecar(path):
+    """表格缓存不存在或已过期时重新生成，返回是否重新生成；不支持缓存的格式返回False"""
+    reader = open_cached(path)
+    if reader is not None:
+        reader.close()
+        return False
+    if os.path.splitext(path)[1].lower() not in CACHED_EXTENSIONS:
+        return False
+    build_sidecar(path)
+    return True
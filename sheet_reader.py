@@ -0,0 +1,174 @@
+# 表格读取层
+# 按扩展名注册读取类，统一提供表头解析与投影列逐行读取接口。
+# 每个读取对象只打开一次数据源，表头与数据行共用同一个句柄。
+import csv # CSV文件读取支持
+import os # 操作系统接口支持
+
+CSV_BUFFER_SIZE = 1024 * 1024 # CSV分块读取缓冲区大小（字节）
+CSV_ENCODINGS = ('utf-8-sig', 'gb18030') # CSV依次尝试的编码
+
+_LOADERS = {} # 扩展名 -> 读取类
+
+
+def register_loader(*extensions):
+    """注册读取类的装饰器，扩展名不区分大小写"""
+    def decorator(cls):
+        for extension in extensions:
+            _LOADERS[extension.lower()] = cls
+        return cls
+    return decorator
+
+
+def supported_extensions():
+    """返回已注册的扩展名列表"""
+    return sorted(_LOADERS)
+
+
+def open_sheet(path, use_cache=True):
+    """按扩展名选择读取类并打开表格
+
+    Args:
+        path: 表格文件路径
+        use_cache: 为True时优先读取与表格内容一致的解析结果缓存，见sheet_cache
+    """
+    extension = os.path.splitext(path)[1].lower()
+    loader = _LOADERS.get(extension)
+    if loader is None:
+        raise ValueError(f"不支持的文件格式：{extension or path}")
+    if use_cache:
+        from sheet_cache import open_cached # 表格解析结果缓存
+        reader = open_cached(path)
+        if reader is not None:
+            return reader
+    return loader(path)
+
+
+class SheetReader:
+    """表格读取基类，读取第一个工作表
+
+    子类需设置self.header并实现_iter_raw_rows()。
+    流式读取类的数据行只能遍历一次。
+    """
+    header = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @property
+    def row_count(self):
+        """数据行数（不含表头），流式读取时未知，返回None"""
+        return None
+
+    def _build_header_index(self):
+        # 列名重复时以第一次出现的位置为准
+        self._header_index = {}
+        for index, name in enumerate(self.header):
+            self._header_index.setdefault(name, index)
+
+    def column_indexes(self, columns):
+        """将列名解析为列号，缺失的列一次性报告"""
+        missing = [name for name in columns if name not in self._header_index]
+        if missing:
+            raise ValueError(f"打开的文件中未能找到对应的列：{'、'.join(missing)}")
+        return [self._header_index[name] for name in columns]
+
+    def iter_rows(self, columns):
+        """逐行生成投影列的值元组，不含表头，跳过空行"""
+        indexes = self.column_indexes(columns)
+        for row in self._iter_raw_rows():
+            if all(value is None or value == '' for value in row):
+                continue
+            size = len(row)
+            yield tuple(('' if row[i] is None else row[i]) if i < size else '' for i in indexes)
+
+    def _iter_raw_rows(self):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+@register_loader('.xls')
+class XlsReader(SheetReader):
+    """旧版Excel(.xls)读取类"""
+    def __init__(self, path):
+        import xlrd # Excel文件读取支持
+        # on_demand仅加载用到的工作表，且不再额外复制一份文件内容
+        self.workbook = xlrd.open_workbook(path, on_demand=True)
+        self.sheet = self.workbook.sheet_by_index(0)
+        self.header = [str(value) for value in self.sheet.row_values(0)] if self.sheet.nrows else []
+        self._build_header_index()
+
+    @property
+    def row_count(self):
+        return max(self.sheet.nrows - 1, 0)
+
+    def iter_rows(self, columns):
+        # 按单元格读取投影列，避免为每行分配整行列表
+        indexes = self.column_indexes(columns)
+        cell_value = self.sheet.cell_value
+        row_values = self.sheet.row_values
+        for row_index in range(1, self.sheet.nrows):
+            row = tuple(cell_value(row_index, column_index) for column_index in indexes)
+            # 投影列全空时才读取整行，整行为空时与其他格式一样跳过
+            if all(value == '' for value in row) and all(value == '' for value in row_values(row_index)):
+                continue
+            yield row
+
+    def close(self):
+        self.workbook.release_resources()
+
+
+@register_loader('.xlsx', '.xlsm')
+class XlsxReader(SheetReader):
+    """Excel(.xlsx)只读流式读取类"""
+    def __init__(self, path):
+        try:
+            import openpyxl # xlsx文件读取支持
+        except ImportError:
+            raise ImportError("读取xlsx文件需要安装openpyxl：pip install openpyxl")
+        self.workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+        self._rows = self.workbook.worksheets[0].iter_rows(values_only=True)
+        first_row = next(self._rows, None) or ()
+        self.header = ['' if value is None else str(value) for value in first_row]
+        self._build_header_index()
+
+    def _iter_raw_rows(self):
+        return self._rows
+
+    def close(self):
+        self.workbook.close()
+
+
+@register_loader('.csv')
+class CsvReader(SheetReader):
+    """CSV流式读取类，按缓冲块读取，内存占用与文件大小无关"""
+    def __init__(self, path):
+        self.file = self._open(path)
+        self._rows = csv.reader(self.file)
+        self.header = next(self._rows, [])
+        self._build_header_index()
+
+    @staticmethod
+    def _open(path):
+        # 依次尝试编码，以文件开头的一个缓冲块作为判断依据
+        with open(path, 'rb') as f:
+            sample = f.read(CSV_BUFFER_SIZE)
+        for encoding in CSV_ENCODINGS:
+            try:
+                sample.decode(encoding)
+            except UnicodeDecodeError as e:
+                # 缓冲块末尾可能截断多字节字符
+                if e.start < len(sample) - 4:
+                    continue
+            return open(path, 'r', encoding=encoding, newline='', buffering=CSV_BUFFER_SIZE)
+        raise ValueError(f"无法识别CSV文件编码：{path}")
+
+    def _iter_raw_rows(self):
+        return self._rows
+
+    def close(self):
+        self.file.close()
@@ -0,0 +1,135 @@
+# 访问令牌缓存
+# 进程内缓存access_token，按(企业ID, 应用ID)分别保存并跟踪过期时间，
+# 按键单飞刷新，磁盘文件作为原子写入的后备存储
+import os # 操作系统接口支持
+import tempfile # 临时文件操作支持
+import threading # 线程支持
+import time # 时间操作支持
+import logging
+
+TOKEN_LIFETIME = 7200 # 企业微信access_token有效期（秒）
+TOKEN_REFRESH_MARGIN = 300 # 提前刷新的时间余量（秒）
+TOKEN_MIN_AGE = 10 # 令牌获取后该秒数内不因失效请求而丢弃，避免并发请求重复刷新
+
+
+class TokenCache:
+    """线程安全的访问令牌缓存
+
+    Args:
+        path: 后备存储文件路径，每行保存 键\\t过期时间\\t凭据指纹\\t令牌
+        refresh_margin: 距过期不足该秒数时主动刷新
+    """
+    def __init__(self, path, refresh_margin=TOKEN_REFRESH_MARGIN):
+        self.path = path
+        self.refresh_margin = refresh_margin
+        self._tokens = {} # 键 -> (令牌, 过期时间, 凭据指纹)
+        self._locks = {} # 键 -> 刷新锁
+        self._fetched_at = {} # 键 -> 本进程内获取令牌的时间
+        self._guard = threading.Lock()
+        self._loaded = False
+
+    def get(self, key, fetch, fingerprint=''):
+        """获取令牌，必要时调用fetch()刷新
+
+        Args:
+            key: 缓存键，如 (企业ID, 应用ID)
+            fetch: 无参函数，返回 (令牌, 有效期秒数)
+            fingerprint: 凭据指纹，与缓存不一致时（如Secret已修改）视为未命中
+        """
+        key = self._format_key(key)
+        self._load_once()
+        now = time.time()
+        entry = self._entry(key, fingerprint)
+        if entry and now < entry[1] - self.refresh_margin:
+            return entry[0]
+        lock = self._lock_for(key)
+        # 令牌仍在有效期内时，若已有线程在刷新则直接使用旧令牌
+        if entry and now < entry[1] and not lock.acquire(blocking=False):
+            return entry[0]
+        if not (entry and now < entry[1]):
+            lock.acquire()
+        try:
+            # 获得锁后再次检查，其它线程可能已完成刷新
+            entry = self._entry(key, fingerprint)
+            if entry and time.time() < entry[1] - self.refresh_margin:
+                return entry[0]
+            token, expires_in = fetch()
+            with self._guard:
+                self._tokens[key] = (token, time.time() + float(expires_in or TOKEN_LIFETIME), fingerprint)
+                self._fetched_at[key] = time.time()
+                self._save()
+            return token
+        finally:
+            lock.release()
+
+    def invalidate(self, key, min_age=0):
+        """使指定键的令牌失效，下次获取时强制刷新
+
+        Args:
+            key: 缓存键
+            min_age: 令牌获取不足该秒数时不失效，说明已有其它线程刷新过
+        """
+        key = self._format_key(key)
+        with self._guard:
+            if time.time() - self._fetched_at.get(key, 0) < min_age:
+                return
+            if self._tokens.pop(key, None) is not None:
+                self._save()
+
+    @staticmethod
+    def _format_key(key):
+        if isinstance(key, tuple):
+            return ':'.join(str(part) for part in key)
+        return str(key)
+
+    def _entry(self, key, fingerprint):
+        entry = self._tokens.get(key)
+        if entry is None or entry[2] != fingerprint:
+            return None
+        return entry
+
+    def _lock_for(self, key):
+        with self._guard:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def _load_once(self):
+        if self._loaded:
+            return
+        with self._guard:
+            if self._loaded:
+                return
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    for line in f:
+                        fields = line.rstrip('\n').split('\t')
+                        # 忽略旧格式及损坏的行
+                        if len(fields) != 4:
+                            continue
+                        key, expires_at, fingerprint, token = fields
+                        self._tokens[key] = (token, float(expires_at), fingerprint)
+            except FileNotFoundError:
+                pass
+            except (OSError, ValueError) as e:
+                logging.warning(f"读取令牌文件失败，将重新获取令牌：{e}")
+            self._loaded = True
+
+    def _save(self):
+        """原子写入后备文件，调用方需持有self._guard"""
+        directory = os.path.dirname(os.path.abspath(self.path))
+        now = time.time()
+        temp_name = None
+        try:
+            with tempfile.NamedTemporaryFile('w', encoding='utf-8', dir=directory, delete=False) as f:
+                temp_name = f.name
+                for key, (token, expires_at, fingerprint) in self._tokens.items():
+                    # 已过期的令牌不再写回
+                    if expires_at > now:
+                        f.write(f"{key}\t{expires_at}\t{fingerprint}\t{token}\n")
+                f.flush()
+                os.fsync(f.fileno())
+            # 重命名新文件，相当于剪切+粘贴，覆盖原来的令牌文件
+            os.replace(temp_name, self.path)
+        except OSError as e:
+            logging.warning(f"保存令牌文件失败：{e}")
+            if temp_name and os.path.exists(temp_name):
+                os.remove(temp_name)
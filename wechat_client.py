@@ -0,0 +1,246 @@
+# 企业微信消息发送
+# 共享连接池的HTTP会话、访问令牌缓存与消息发送类，不依赖图形界面
+import hashlib # 哈希摘要支持
+import io # 字节流支持
+import json # JSON数据处理支持
+import os # 操作系统接口支持
+import threading # 线程支持
+import time # 时间操作支持
+import uuid # 唯一标识生成支持
+from config_manager import get_config_manager # 配置管理
+from token_cache import TokenCache, TOKEN_MIN_AGE # 访问令牌缓存
+from media_cache import media_cache, file_digest, UPLOAD_CONCURRENCY # 临时素材缓存
+from metrics import metrics # 发送链路指标
+from retry import TOKEN_EXPIRED_ERRCODES # 令牌失效错误码
+
+TOKEN_FILE = 'token_access.conf' # 访问令牌文件路径
+API_BASE_URL = 'https://qyapi.weixin.qq.com/cgi-bin' # 企业微信接口地址，可在配置节中以api_base覆盖（如本地模拟服务）
+HTTP_POOL_SIZE = 16 # 默认HTTP连接池大小，群发时按并发数扩大
+HTTP_CONNECT_TIMEOUT = 5 # HTTP连接超时（秒）
+HTTP_READ_TIMEOUT = 30 # HTTP读取超时（秒）
+
+# 全局访问令牌缓存，令牌文件作为后备存储
+token_cache = TokenCache(TOKEN_FILE)
+
+# 全局共享的HTTP会话，所有发送共用同一连接池并保持长连接
+_http_session = None
+_http_pool_size = 0 # 共享会话当前的连接池大小
+_http_session_lock = threading.Lock()
+
+def http_pool_size(concurrency=None):
+    """群发并发数对应的连接池大小：连接池满时请求会阻塞等待，需容纳全部并发发送及附件上传"""
+    if not concurrency:
+        return HTTP_POOL_SIZE
+    return max(HTTP_POOL_SIZE, int(concurrency) + UPLOAD_CONCURRENCY)
+
+def _mount_pool(session, pool_size):
+    from requests.adapters import HTTPAdapter # HTTP连接池支持
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, pool_block=True)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+
+def new_http_session(pool_size=HTTP_POOL_SIZE):
+    """创建带独立连接池的HTTP会话"""
+    # requests加载较慢，首次创建会话时才导入，不发送消息的启动路径无需加载
+    import requests # HTTP请求支持
+    session = requests.Session()
+    _mount_pool(session, pool_size)
+    session.headers.update({'Connection': 'keep-alive'})
+    return session
+
+def get_http_session(pool_size=HTTP_POOL_SIZE):
+    """获取共享HTTP会话，首次调用时创建；连接池小于pool_size时换用更大的连接池"""
+    global _http_session, _http_pool_size
+    with _http_session_lock:
+        if _http_session is None:
+            _http_session = new_http_session(pool_size)
+            _http_pool_size = pool_size
+        elif pool_size > _http_pool_size:
+            # 在原会话上替换连接池，已创建的发送对象共用该会话，随之生效
+            _mount_pool(_http_session, pool_size)
+            _http_pool_size = pool_size
+        return _http_session
+
+# 定义企业微信消息发送类
+# 配置应用相关初始信息
+class WeChat:
+    """企业微信消息发送类"""
+    def __init__(self, config_section=None, session=None, timeout=None, config_manager=None, api_base=None):
+        """初始化企业微信配置
+        Args:
+            config_section: 配置节名称，如果为None则使用默认配置
+            session: HTTP会话，如果为None则使用全局共享会话
+            timeout: (连接超时, 读取超时)，如果为None则使用全局配置
+            config_manager: 配置管理对象，如果为None则读取默认配置文件
+            api_base: 接口地址，如果为None则使用配置节中的api_base或全局配置
+        """
+        if config_manager is None:
+            config_manager = get_config_manager()
+        if config_section is None:
+            config_section = config_manager.get_default_section()
+            if not config_section:
+                raise ValueError("未找到默认配置节")
+        
+        if not config_manager.validate_config(config_section):
+            raise ValueError(f"配置节 {config_section} 不完整或无效")
+        
+        config = config_manager.config[config_section]
+        self.CORPID = config.get('cropid')  # 企业ID
+        self.CORPSECRET = config.get('screctid')  # 应用Secret
+        self.AGENTID = config.get('agentid')  # 应用Agentid
+        self.ACCESS_TOKEN_PATH = TOKEN_FILE  # 存放access_token的路径
+        self.api_base = (api_base or config.get('api_base') or API_BASE_URL).rstrip('/')
+        # 令牌按(企业ID, 应用ID)分别缓存，Secret仅以指纹形式保存，用于识别凭据变更
+        self.token_key = (self.CORPID, self.AGENTID)
+        if self.api_base != API_BASE_URL:
+            # 非默认接口地址（如模拟服务）的令牌与正式令牌分开缓存
+            self.token_key = (self.api_base,) + self.token_key
+        self.token_fingerprint = hashlib.sha256(self.CORPSECRET.encode('utf-8')).hexdigest()[:16]
+        self.session = session or get_http_session()  # 复用连接池的HTTP会话
+        self.timeout = timeout or (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)
+        # self.AGENTID = "1000025"  # 应用Agentid
+        # self.ACCESS_TOKEN_PATH = "access_token.conf" # 存放access_token的路径
+# 根据初始配置信息获得登录信息access_token
+    @metrics.timed('token_refresh')
+    def _get_access_token(self):       
+        url = f'{self.api_base}/gettoken?corpid={self.CORPID}&corpsecret={self.CORPSECRET}'
+        res = self.session.get(url=url, timeout=self.timeout)
+        res.raise_for_status()
+        result = json.loads(res.text)
+        if result.get('errcode', 0) != 0:
+            raise RuntimeError(f"获取access_token失败：{result.get('errmsg')}")
+        return result['access_token'], result.get('expires_in')
+
+        """
+        从令牌缓存中读取access_token，临近过期时自动刷新
+        """
+    @metrics.timed('get_access_token')
+    def get_access_token(self):
+        return token_cache.get(self.token_key, self._get_access_token, self.token_fingerprint)
+
+    def invalidate_access_token(self):
+        token_cache.invalidate(self.token_key, TOKEN_MIN_AGE)
+
+        """
+        发送消息(可以定义消息类型)，
+        匹配message的生成内容，可以定义一个创建消息类型的类build_message。
+        可以增加传递参数，touser,通过表单的内容获取
+        """
+    def send_message(self, message, msg_type,to_users, duplicate_check_interval=None):
+        url = f"{self.api_base}/message/send?access_token={self.get_access_token()}"
+        send_values = {
+            "touser": to_users,
+            "msgtype": msg_type,
+            "agentid": self.AGENTID,
+            # 文件消息的message为已上传的media_id
+            msg_type: {"media_id": message} if msg_type == 'file' else {
+                "content": message
+            },
+        }
+        if duplicate_check_interval:
+            # 服务端重复消息检查：间隔内向同一用户发送相同内容时不再投递
+            send_values["enable_duplicate_check"] = 1
+            send_values["duplicate_check_interval"] = duplicate_check_interval
+        send_message = (bytes(json.dumps(send_values,ensure_ascii=False), 'utf-8'))
+        # 接口耗时不含令牌获取，令牌获取单独计时
+        started = time.perf_counter()
+        try:
+            res = self.session.post(url, send_message, timeout=self.timeout)
+            res.raise_for_status()
+            result = res.json()
+        except Exception as e:
+            metrics.count('send_exception', type(e).__name__)
+            raise
+        metrics.record_send(started, result.get('errcode', -1))
+        # 返回完整结果，包含errcode、errmsg、invaliduser、msgid等字段
+        return result
+
+
+    @metrics.timed('upload_media')
+    def upload_media(self, file, media_type='file'):
+        """上传临时素材，文件内容流式读取，返回 (media_id, 上传时间)"""
+        url = f"{self.api_base}/media/upload?access_token={self.get_access_token()}&type={media_type}"
+        with _MultipartFile(file) as body:
+            res = self.session.post(url, data=body, headers={'Content-Type': body.content_type}, timeout=self.timeout)
+        res.raise_for_status()
+        result = res.json()
+        if result.get('errcode', 0) != 0:
+            raise RuntimeError(f"上传附件失败：{result.get('errmsg')}")
+        return result['media_id'], float(result.get('created_at') or time.time())
+
+    def _get_json(self, path, **params):
+        """调用通讯录等GET接口，令牌失效时刷新后重试一次"""
+        for attempt in range(2):
+            params['access_token'] = self.get_access_token()
+            res = self.session.get(f"{self.api_base}/{path}", params=params, timeout=self.timeout)
+            res.raise_for_status()
+            result = res.json()
+            errcode = result.get('errcode', 0)
+            if errcode in TOKEN_EXPIRED_ERRCODES and attempt == 0:
+                self.invalidate_access_token()
+                continue
+            if errcode != 0:
+                raise RuntimeError(f"调用{path}接口失败：{result.get('errmsg')}")
+            return result
+
+    @metrics.timed('list_departments')
+    def list_departments(self):
+        """获取应用可见范围内的全部部门"""
+        return self._get_json('department/list')['department']
+
+    @metrics.timed('list_department_users')
+    def list_department_users(self, department_id):
+        """获取部门（不含子部门）成员的详细信息，包括手机号、邮箱、别名与自定义字段"""
+        return self._get_json('user/list', department_id=department_id)['userlist']
+
+    def send_file(self, file, to_users):
+        """上传附件并发送给to_users，同一文件在有效期内只上传一次"""
+        media_id = media_cache.get(self.token_key + (file_digest(file),), lambda: self.upload_media(file))
+        return self.send_message(media_id, 'file', to_users)
+
+
+class _MultipartFile:
+    """流式multipart/form-data请求体，按需从磁盘读取文件而不整体载入内存"""
+    def __init__(self, path, field='media'):
+        boundary = uuid.uuid4().hex
+        filename = os.path.basename(path).replace('"', '')
+        self.content_type = f'multipart/form-data; boundary={boundary}'
+        self._parts = [
+            io.BytesIO((f'--{boundary}\r\nContent-Disposition: form-data; name="{field}"; filename="{filename}"; '
+                        f'filelength={os.path.getsize(path)}\r\nContent-Type: application/octet-stream\r\n\r\n').encode('utf-8')),
+            open(path, 'rb'),
+            io.BytesIO(f'\r\n--{boundary}--\r\n'.encode('utf-8')),
+        ]
+        self._length = sum(self._part_length(part) for part in self._parts)
+
+    @staticmethod
+    def _part_length(part):
+        if isinstance(part, io.BytesIO):
+            return len(part.getbuffer())
+        return os.fstat(part.fileno()).st_size
+
+    def __len__(self):
+        return self._length
+
+    def read(self, size=-1):
+        chunks = []
+        while self._parts and (size < 0 or size > 0):
+            chunk = self._parts[0].read(size)
+            if not chunk:
+                self._parts.pop(0).close()
+                continue
+            chunks.append(chunk)
+            if size > 0:
+                size -= len(chunk)
+        return b''.join(chunks)
+
+    def close(self):
+        for part in self._parts:
+            part.close()
+        self._parts = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()